@@ -1,36 +1,59 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import math
-from scipy.stats import norm
+from scipy.special import ndtr
 
 def gaussian(x, mu, sigma):
     return (
         1.0 / (np.sqrt(2.0 * np.pi) * sigma) * np.exp(-np.power((x - mu) / sigma, 2.0) / 2)
     )
 
+def black_scholes_d1_d2(S, D, t, T, E, sigma, r):
+    """Broadcast the inputs and compute d1, d2 for the closed form, following Wilmott.
+    Returns (S, E, tau, live, d1, d2) where live masks the entries with T - t > 0;
+    d1 and d2 are only meaningful where live is True."""
+    S, D, t, T, E, sigma, r = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (S, D, t, T, E, sigma, r))
+    )
+    tau = T - t
+    live = tau > 0
+    # evaluate expired entries with a dummy tau so no warnings are raised, they are masked out later
+    tau = np.where(live, tau, 1.0)
+    sigma_sqrt_tau = sigma * np.sqrt(tau)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(S / E) + (r - D + 0.5 * sigma * sigma) * tau) / sigma_sqrt_tau
+    d2 = d1 - sigma_sqrt_tau
+    return S, E, tau, live, d1, d2
+
+def black_scholes_call_put(S, D, t, T, E, sigma, r):
+    """Closed form Black Scholes call and put values from one shared d1/d2 evaluation.
+    All arguments broadcast against each other; returns two ndarrays (call, put)."""
+    S, E, tau, live, d1, d2 = black_scholes_d1_d2(S, D, t, T, E, sigma, r)
+    S_discounted = S * np.exp(-D * tau)
+    E_discounted = E * np.exp(-r * tau)
+    call = S_discounted * ndtr(d1) - E_discounted * ndtr(d2)
+    put = E_discounted * ndtr(-d2) - S_discounted * ndtr(-d1)
+    call = np.where(live, call, np.maximum(S - E, 0))
+    put = np.where(live, put, np.maximum(E - S, 0))
+    return call, put
+
+def black_scholes_value(S, D, t, T, E, sigma, r, option_type="call"):
+    """Closed form Black Scholes value as an ndarray, option_type is "call", "put" or "straddle"."""
+    call, put = black_scholes_call_put(S, D, t, T, E, sigma, r)
+    if option_type == "call":
+        return call
+    if option_type == "put":
+        return put
+    if option_type == "straddle":
+        return call + put
+    raise ValueError(f"Unknown option type {option_type}")
+
 def BlackScholesCallValue(S_array, D, t, T, E, sigma, r):
     """Closed form Black Scholes value for a call, following Wilmott."""
-    retval = []
-    for S in S_array:
-        if T - t > 0:
-            d1 = (math.log(S/E) + (r - D + 1/2 * sigma * sigma)*(T - t)) / (sigma * math.sqrt(T - t))
-            d2 = d1 - sigma * math.sqrt(T - t)
-            retval.append(S * math.exp(-D * (T - t)) * norm.cdf(d1) - E * math.exp(-r * (T - t)) * norm.cdf(d2))
-        else:
-            retval.append(max(0, S - E))
-    return retval
+    return black_scholes_value(S_array, D, t, T, E, sigma, r, "call").tolist()
 
 def BlackScholesPutValue(S_array, D, t, T, E, sigma, r):
-    """Closed form Black Scholes value for a call, following Wilmott."""
-    retval = []
-    for S in S_array:
-        if T - t > 0:
-            d1 = (math.log(S/E) + (r - D + 1/2 * sigma * sigma)*(T - t)) / (sigma * math.sqrt(T - t))
-            d2 = d1 - sigma * math.sqrt(T - t)
-            retval.append(-S * math.exp(-D * (T - t)) * norm.cdf(-d1) + E * math.exp(-r * (T - t)) * norm.cdf(-d2))
-        else:
-            retval.append(max(0, E - S))
-    return retval
+    """Closed form Black Scholes value for a put, following Wilmott."""
+    return black_scholes_value(S_array, D, t, T, E, sigma, r, "put").tolist()
 
 if __name__ == '__main__':
     """Black Scholes closed form example, following Wilmott."""
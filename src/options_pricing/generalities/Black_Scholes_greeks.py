@@ -0,0 +1,73 @@
+import matplotlib.pyplot as plt
+import numpy as np
+from typing import NamedTuple
+from scipy.special import ndtr
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_d1_d2
+
+class Greeks(NamedTuple):
+    """Value and sensitivities of an option, each an ndarray.
+    theta is dV/dt, following Wilmott, so it is usually negative for a long option."""
+    value: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    theta: np.ndarray
+    rho: np.ndarray
+    dividend_rho: np.ndarray
+
+def black_scholes_greeks(S, D, t, T, E, sigma, r, option_type="call") -> Greeks:
+    """Closed form Black Scholes value and Greeks from one shared evaluation of d1, d2,
+    the normal pdf and the normal cdfs. All arguments broadcast against each other,
+    option_type is "call" or "put". At expiry the Greeks are those of the payoff."""
+    S, E, tau, live, d1, d2 = black_scholes_d1_d2(S, D, t, T, E, sigma, r)
+    D, sigma, r = (np.asarray(a, dtype=float) for a in (D, sigma, r))
+    if option_type == "call":
+        sign = 1.0
+    elif option_type == "put":
+        sign = -1.0
+    else:
+        raise ValueError(f"Unknown option type {option_type}")
+
+    sqrt_tau = np.sqrt(tau)
+    S_discounted = S * np.exp(-D * tau)
+    E_discounted = E * np.exp(-r * tau)
+    pdf_d1 = np.exp(-0.5 * d1 * d1) / np.sqrt(2.0 * np.pi)
+    # N(d1), N(d2) for a call and N(-d1), N(-d2) for a put
+    cdf_d1 = ndtr(sign * d1)
+    cdf_d2 = ndtr(sign * d2)
+
+    # quantities shared between several Greeks
+    S_term = S_discounted * cdf_d1
+    E_term = E_discounted * cdf_d2
+    S_pdf = S_discounted * pdf_d1
+
+    value = sign * (S_term - E_term)
+    delta = sign * np.exp(-D * tau) * cdf_d1
+    gamma = S_pdf / (S * S * sigma * sqrt_tau)
+    vega = S_pdf * sqrt_tau
+    theta = -0.5 * sigma * S_pdf / sqrt_tau + sign * (D * S_term - r * E_term)
+    rho = sign * tau * E_term
+    dividend_rho = -sign * tau * S_term
+
+    # at expiry, replace with the payoff and its derivatives
+    intrinsic = sign * (S - E)
+    zero = np.zeros_like(value)
+    return Greeks(
+        np.where(live, value, np.maximum(intrinsic, 0)),
+        np.where(live, delta, np.where(intrinsic > 0, sign, 0.0)),
+        np.where(live, gamma, zero),
+        np.where(live, vega, zero),
+        np.where(live, theta, zero),
+        np.where(live, rho, zero),
+        np.where(live, dividend_rho, zero),
+    )
+
+if __name__ == '__main__':
+    """Greeks of a call across asset prices, following Wilmott."""
+    sigma = 0.1
+    S_values = np.linspace(1, 100, 990)
+    greeks = black_scholes_greeks(S_values, 0, 45, 50, 50, sigma, 0.05)
+    for name in ["delta", "gamma", "vega", "theta"]:
+        plt.plot(S_values, getattr(greeks, name))
+    plt.legend(["delta", "gamma", "vega", "theta"])
+    plt.show()
@@ -1,4 +1,8 @@
-import math
+import numpy as np
+from scipy.stats import binom
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_call_put, black_scholes_value
+from src.options_pricing.generalities.Black_Scholes_greeks import Greeks
+from src.options_pricing.generalities.resolution import ResolutionResult, refine_to_tolerance
 
 def get_payoff(derivative_type, stock, exercise):
     if derivative_type=="call":
@@ -7,30 +11,337 @@ def get_payoff(derivative_type, stock, exercise):
         return max(0, exercise - stock)
     return 0
 
-def get_binary_value(r, sigma, S, E, t, T, timesteps, deriv_type):
-    dt = (T - t) / timesteps
-    A = 0.5 * (math.exp(-r * dt) + math.exp((r + sigma * sigma) * dt))
-    d = A - math.sqrt(A * A - 1)
-    u = A + math.sqrt(A * A - 1)
-    p = (math.exp(r * dt) - d) / (u - d)
-    discount = math.exp(-r * dt)
+def vanilla_payoff(S_nodes, E, option_type):
+    """Payoff at an array of node prices, option_type is "call", "put" or "straddle"."""
+    if option_type == "call":
+        return np.maximum(S_nodes - E, 0)
+    if option_type == "put":
+        return np.maximum(E - S_nodes, 0)
+    if option_type == "straddle":
+        return np.abs(S_nodes - E)
+    raise ValueError(f"Unknown option type {option_type}")
+
+def _payoff_slope(S_nodes, E, option_type):
+    """Derivative of vanilla_payoff in S, the delta of an expired contract."""
+    if option_type == "call":
+        return np.where(S_nodes > E, 1.0, 0.0)
+    if option_type == "put":
+        return np.where(S_nodes < E, -1.0, 0.0)
+    if option_type == "straddle":
+        return np.sign(S_nodes - E)
+    raise ValueError(f"Unknown option type {option_type}")
+
+def _type_masks(option_types):
+    """Masks of the rows whose payoff has a call part and a put part, a straddle has both."""
+    calls = np.isin(option_types, ("call", "straddle"))
+    puts = np.isin(option_types, ("put", "straddle"))
+    if not np.all(calls | puts):
+        raise ValueError(f"Unknown option type in {np.unique(option_types)}")
+    return calls, puts
+
+def chain_payoff(strikes, option_types):
+    """Payoff of many contracts on the same node prices, one row per contract.
+    strikes is a column vector and option_types a matching column of "call", "put" or "straddle".
+    Returns a function from node prices to the payoff matrix, with the type masks worked out once."""
+    distinct_types = np.unique(option_types)
+    if len(distinct_types) == 1 and distinct_types[0] in ("call", "put", "straddle"):
+        option_type = str(distinct_types[0])
+        return lambda S_nodes: vanilla_payoff(S_nodes, strikes, option_type)
+    calls, puts = _type_masks(option_types)
+    return lambda S_nodes: calls * np.maximum(S_nodes - strikes, 0) + puts * np.maximum(strikes - S_nodes, 0)
+
+def chain_european_value(strikes, option_types, D, sigma, r):
+    """Like chain_payoff, but a function from node prices and time to expiry to closed form values."""
+    calls, puts = _type_masks(option_types)
+    def european_value(S_nodes, tau):
+        call, put = black_scholes_call_put(S_nodes, D, 0, tau, strikes, sigma, r)
+        return calls * call + puts * put
+    return european_value
+
+def wilmott_parameters(sigma, r, dt, D=0.0):
+    """Up and down factors and risk neutral probability of the up move, following Wilmott,
+    so that u d = 1 and the tree matches the mean and variance of the asset over dt."""
+    A = 0.5 * (np.exp(-(r - D) * dt) + np.exp((r - D + sigma * sigma) * dt))
+    u = A + np.sqrt(A * A - 1)
+    d = A - np.sqrt(A * A - 1)
+    p = (np.exp((r - D) * dt) - d) / (u - d)
+    return u, d, p
+
+def _peizer_pratt(z, n):
+    """Peizer-Pratt method 2 inversion of the normal distribution onto an n step binomial."""
+    return 0.5 + np.sign(z) * 0.5 * np.sqrt(
+        1.0 - np.exp(-(z / (n + 1.0 / 3.0 + 0.1 / (n + 1))) ** 2 * (n + 1.0 / 6.0))
+    )
+
+def leisen_reimer_parameters(S, D, tau, E, sigma, r, num_steps):
+    """Up and down factors and up probability of the Leisen-Reimer tree, which centres the
+    lattice on the strike so that the price converges smoothly, at second order, for odd
+    num_steps. Unlike the Wilmott parameters these depend on S and E."""
+    sigma_sqrt_tau = sigma * np.sqrt(tau)
+    d1 = (np.log(S / E) + (r - D + 0.5 * sigma * sigma) * tau) / sigma_sqrt_tau
+    d2 = d1 - sigma_sqrt_tau
+    p = _peizer_pratt(d2, num_steps)
+    growth = np.exp((r - D) * tau / num_steps)
+    u = growth * _peizer_pratt(d1, num_steps) / p
+    d = (growth - p * u) / (1 - p)
+    return u, d, p
+
+TREE_SCHEMES = ("wilmott", "leisen_reimer", "bbs")
+# order of the leading error term in 1 / num_steps for European payoffs, used by Richardson
+# extrapolation; early exercise brings every scheme down to first order
+RICHARDSON_ORDER = {"wilmott": 1, "leisen_reimer": 2, "bbs": 1}
+
+def _backward_induction(V, S, u, d, pu, pd, num_steps, exercise=None, keep_layers=()):
+    """Roll option values V, of shape (rows x num_steps + 1 nodes), back to the root in place.
+    S, u, d, pu and pd are column vectors (or scalars) broadcasting against the rows; pu and pd
+    are the discounted up and down probabilities. Node n of layer m sits at S d^(m - n) u^n.
+    exercise, if given, maps node prices to early exercise values for American options.
+    Returns the root values and a dict from each layer in keep_layers to (values, node prices)."""
+    # node prices of layer m are S d^m (u / d)^n, only the scalar d^m changes with m
+    ratio_powers = (u / d) ** np.arange(num_steps + 1)
+    scratch = np.empty_like(V)
+    kept = {}
+    if num_steps in keep_layers:
+        kept[num_steps] = (V.copy(), np.broadcast_to(S * d ** num_steps * ratio_powers, V.shape).copy())
+    for m in range(num_steps, 0, -1):
+        # V[n] <- pd V[n] + pu V[n + 1] for the m nodes of layer m - 1
+        np.multiply(V[:, 1:m + 1], pu, out=scratch[:, :m])
+        np.multiply(V[:, :m], pd, out=V[:, :m])
+        V[:, :m] += scratch[:, :m]
+        if exercise is not None or m - 1 in keep_layers:
+            # a single row of node prices when all rows share the lattice
+            S_nodes = ratio_powers[..., :m] * (S * d ** (m - 1))
+            if exercise is not None:
+                np.maximum(V[:, :m], exercise(S_nodes), out=V[:, :m])
+            if m - 1 in keep_layers:
+                kept[m - 1] = (V[:, :m].copy(), np.broadcast_to(S_nodes, V[:, :m].shape).copy())
+    return V[:, 0], kept
+
+def _lattice(S, D, tau, E, sigma, r, num_steps, scheme):
+    """Up and down factors, up probability and one step discount factor of the given scheme.
+    "wilmott" and "bbs" use wilmott_parameters, "leisen_reimer" leisen_reimer_parameters
+    (E is only needed for those)."""
+    dt = tau / num_steps
+    if scheme == "leisen_reimer":
+        u, d, p = leisen_reimer_parameters(S, D, tau, E, sigma, r, num_steps)
+    elif scheme in ("wilmott", "bbs"):
+        u, d, p = wilmott_parameters(sigma, r, dt, D)
+    else:
+        raise ValueError(f"Unknown tree scheme {scheme}, expected one of {TREE_SCHEMES}")
+    return u, d, p, np.exp(-r * dt)
+
+def _tree(S, D, tau, E, sigma, r, num_steps, payoff, european_value, american, scheme, keep_layers=()):
+    """Build the lattice of the given scheme and roll the payoff back over it.
+    "bbs", the binomial Black-Scholes tree, replaces the last step of the Wilmott tree by
+    closed form values from european_value(S_nodes, dt)."""
+    dt = tau / num_steps
+    u, d, p, discount = _lattice(S, D, tau, E, sigma, r, num_steps, scheme)
 
-    a = [None for _ in range(timesteps + 1)]
-    a[0] = S
+    steps = num_steps - 1 if scheme == "bbs" else num_steps
+    S_nodes = S * d ** steps * (u / d) ** np.arange(steps + 1)
+    if scheme == "bbs":
+        V = european_value(S_nodes, dt)
+        if american:
+            V = np.maximum(V, payoff(S_nodes))
+    else:
+        V = payoff(S_nodes)
+    exercise = payoff if american else None
+    return _backward_induction(V, S, u, d, discount * p, discount * (1 - p), steps, exercise, keep_layers)
 
-    for m in range(1, timesteps + 1):
-        for n in range(m, 0, -1):
-            a[n] = u * a[n - 1]
-        a[0] = d * a[0]
+def _expectation(S, D, tau, E, sigma, r, num_steps, payoff, european_value, scheme):
+    """European values as one discounted expectation over the last layer, without a roll back.
+    The binomial weights discount^n C(n, k) p^k (1 - p)^(n - k) of the nodes are worked out
+    once, so a whole chain is a single (payoffs x nodes) @ weights product. With "bbs" the
+    expectation is over the closed form values one step before expiry."""
+    dt = tau / num_steps
+    u, d, p, discount = _lattice(S, D, tau, E, sigma, r, num_steps, scheme)
 
-    for n in range(len(a)):
-        a[n] = get_payoff(deriv_type, a[n], E)
+    steps = num_steps - 1 if scheme == "bbs" else num_steps
+    nodes = np.arange(steps + 1)
+    S_nodes = S * d ** steps * (u / d) ** nodes
+    V = european_value(S_nodes, dt) if scheme == "bbs" else payoff(S_nodes)
+    weights = discount ** steps * binom.pmf(nodes, steps, p)
+    if weights.ndim == 1:
+        return V @ weights
+    # Leisen-Reimer lattices depend on the strike, one row of weights per contract
+    return np.einsum("ij,ij->i", V, weights)
 
-    for m in range(timesteps, 0 , -1):
-        for n in range(m):
-            a[n] = discount * (p * a[n + 1] + (1 - p) * a[n])
+def _step_count(scheme, num_steps):
+    """Leisen-Reimer trees are only defined for odd step counts, round up to the next one."""
+    if scheme == "leisen_reimer" and num_steps % 2 == 0:
+        return num_steps + 1
+    return num_steps
 
-    return a[0]
+def _richardson(values_for_steps, scheme, num_steps, american):
+    """Two point Richardson extrapolation from num_steps and about half as many steps.
+    Both step counts have the same parity, so the odd-even wiggle of the lattice cancels."""
+    fine_steps = _step_count(scheme, num_steps)
+    coarse_steps = fine_steps // 2
+    if coarse_steps % 2 != fine_steps % 2:
+        coarse_steps += 1
+    order = 1 if american else RICHARDSON_ORDER[scheme]
+    fine, coarse = values_for_steps(fine_steps), values_for_steps(coarse_steps)
+    return (fine_steps ** order * fine - coarse_steps ** order * coarse) / (fine_steps ** order - coarse_steps ** order)
+
+def _as_columns(*args):
+    """Broadcast the arguments together and flatten each into a column vector."""
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in args))
+    return arrays[0].shape, [a.reshape(-1, 1) for a in arrays]
+
+def binomial_values(S, D, t, T, E, sigma, r, num_steps, option_type="call", american=False,
+                    scheme="wilmott", richardson=False, keep_layers=()):
+    """Binomial tree values for a whole strip of contracts, rolled back together.
+    S, D, t, T, E, sigma and r broadcast against each other; every contract gets a row of
+    one (contracts x num_steps + 1) buffer that is rolled back with slice operations.
+    scheme is one of TREE_SCHEMES, and richardson extrapolates from num_steps and half of it.
+    Contracts with T - t <= 0 are worth their payoff, as in the closed form.
+    Returns the values in the broadcast shape, or with keep_layers also the dict of kept
+    layers from _backward_induction, with one row per contract."""
+    shape, (S, D, t, T, E, sigma, r) = _as_columns(S, D, t, T, E, sigma, r)
+    live = (T - t)[:, 0] > 0
+    # roll expired rows back over a dummy tau so p is not 0/0, they are replaced by the payoff
+    tau = np.where(T - t > 0, T - t, 1.0)
+    payoff = lambda S_nodes: vanilla_payoff(S_nodes, E, option_type)
+    european_value = lambda S_nodes, tau: black_scholes_value(S_nodes, D, 0, tau, E, sigma, r, option_type)
+    values_for_steps = lambda steps: _tree(
+        S, D, tau, E, sigma, r, steps, payoff, european_value, american, scheme, keep_layers
+    )
+    if richardson:
+        if keep_layers:
+            raise ValueError("Layers of an extrapolated tree are not available, keep them without richardson")
+        root, kept = _richardson(lambda steps: values_for_steps(steps)[0].copy(), scheme, num_steps, american), {}
+    else:
+        root, kept = values_for_steps(_step_count(scheme, num_steps))
+    root = np.where(live, root, payoff(S)[:, 0])
+    if keep_layers:
+        return root.reshape(shape), kept
+    return root.reshape(shape)
+
+def binomial_chain_values(S, D, t, T, strikes, sigma, r, num_steps, option_types="call", american=False,
+                          scheme="wilmott", richardson=False):
+    """Binomial tree values of a whole chain on one shared lattice.
+    The lattice depends on S, sigma, r, D and dt but not on the strike, so it is built once.
+    European contracts are priced by _expectation, one product of the payoff matrix with
+    the weights of the last layer; American ones are rows of the payoff matrix rolled back
+    in one pass. strikes is a 1-D array and option_types a single type or one type per strike.
+    An expired chain, T - t <= 0, is worth its payoff.
+    The Leisen-Reimer lattice does depend on the strike, with that scheme each row gets its own."""
+    strikes = np.asarray(strikes, dtype=float).reshape(-1, 1)
+    option_types = np.broadcast_to(np.asarray(option_types), strikes.shape[:1]).reshape(-1, 1)
+    payoff = chain_payoff(strikes, option_types)
+    if T - t <= 0:
+        # an expired chain is worth its payoff, there is no lattice to build
+        return payoff(float(S))[:, 0]
+    european_value = chain_european_value(strikes, option_types, D, sigma, r)
+    if american:
+        values_for_steps = lambda steps: _tree(
+            S, D, T - t, strikes, sigma, r, steps, payoff, european_value, american, scheme
+        )[0].copy()
+    else:
+        values_for_steps = lambda steps: _expectation(
+            S, D, T - t, strikes, sigma, r, steps, payoff, european_value, scheme
+        )
+    if richardson:
+        return _richardson(values_for_steps, scheme, num_steps, american)
+    return values_for_steps(_step_count(scheme, num_steps))
+
+def binomial_greeks(S, D, t, T, E, sigma, r, num_steps, option_type="call", american=False, scheme="wilmott") -> Greeks:
+    """Value and Greeks of a strip of contracts from a single backward pass.
+    Delta, gamma and theta are read off the first two layers of the tree. Vega, rho and
+    dividend rho are central differences, with the bumped contracts stacked as extra rows
+    of the same buffer, so the whole set costs one (7 contracts x nodes) roll back.
+    Expired contracts, T - t <= 0, get the payoff, its slope as delta and zero for the rest,
+    as in black_scholes_greeks, and no rows in the tree."""
+    shape, (S, D, t, T, E, sigma, r) = _as_columns(S, D, t, T, E, sigma, r)
+    live = (T - t)[:, 0] > 0
+    if not live.all():
+        greeks = [np.zeros(len(S)) for _ in Greeks._fields]
+        if live.any():
+            live_greeks = binomial_greeks(*(a[live, 0] for a in (S, D, t, T, E, sigma, r)),
+                                          num_steps, option_type, american, scheme)
+            for greek, live_greek in zip(greeks, live_greeks):
+                greek[live] = live_greek
+        greeks[0][~live] = vanilla_payoff(S[~live, 0], E[~live, 0], option_type)
+        greeks[1][~live] = _payoff_slope(S[~live, 0], E[~live, 0], option_type)
+        return Greeks(*(greek.reshape(shape) for greek in greeks))
+    num_steps = _step_count(scheme, num_steps)
+    if num_steps < (4 if scheme == "bbs" else 3):
+        raise ValueError(f"Too few steps for tree Greeks: {num_steps}")
+
+    # rows: base, sigma up and down, r up and down, D up and down
+    sigma_bump = 0.01 * sigma
+    rate_bump = 1e-4
+    zero, h = np.zeros_like(S), np.full_like(S, rate_bump)
+    bumps = [(zero, zero, zero), (sigma_bump, zero, zero), (-sigma_bump, zero, zero),
+             (zero, h, zero), (zero, -h, zero), (zero, zero, h), (zero, zero, -h)]
+    stack = lambda a: np.concatenate([a] * len(bumps))
+    sigma_rows = np.concatenate([sigma + b[0] for b in bumps])
+    r_rows = np.concatenate([r + b[1] for b in bumps])
+    D_rows = np.concatenate([D + b[2] for b in bumps])
+    S_rows, E_rows, tau_rows = stack(S), stack(E), stack(T - t)
+
+    payoff = lambda S_nodes: vanilla_payoff(S_nodes, E_rows, option_type)
+    european_value = lambda S_nodes, tau: black_scholes_value(S_nodes, D_rows, 0, tau, E_rows, sigma_rows, r_rows, option_type)
+    root, kept = _tree(S_rows, D_rows, tau_rows, E_rows, sigma_rows, r_rows, num_steps,
+                       payoff, european_value, american, scheme, keep_layers=(1, 2))
+    rows = len(S)
+    V = root.reshape(len(bumps), rows)
+    value = V[0]
+
+    # delta and gamma from the first two layers of the base rows
+    (V1, S1), (V2, S2) = kept[1], kept[2]
+    V1, S1, V2, S2 = V1[:rows], S1[:rows], V2[:rows], S2[:rows]
+    delta = (V1[:, 1] - V1[:, 0]) / (S1[:, 1] - S1[:, 0])
+    delta_up = (V2[:, 2] - V2[:, 1]) / (S2[:, 2] - S2[:, 1])
+    delta_down = (V2[:, 1] - V2[:, 0]) / (S2[:, 1] - S2[:, 0])
+    gamma = (delta_up - delta_down) / (0.5 * (S2[:, 2] - S2[:, 0]))
+    # theta from the middle node two steps on, moved back to S when u d is not 1
+    S0 = S[:, 0]
+    shift = S2[:, 1] - S0
+    middle = V2[:, 1] - 0.5 * (delta_up + delta_down) * shift - 0.5 * gamma * shift * shift
+    theta = (middle - value) / (2 * tau_rows[:rows, 0] / num_steps)
+
+    vega = (V[1] - V[2]) / (2 * sigma_bump[:, 0])
+    rho = (V[3] - V[4]) / (2 * rate_bump)
+    dividend_rho = (V[5] - V[6]) / (2 * rate_bump)
+    return Greeks(*(a.reshape(shape) for a in (value, delta, gamma, vega, theta, rho, dividend_rho)))
+
+def binomial_values_to_tolerance(S, D, t, T, E, sigma, r, tol, option_type="call", american=False,
+                                 scheme="wilmott", start_steps=25, max_steps=12800) -> ResolutionResult:
+    """Binomial tree values at the fewest steps, doubling from start_steps, whose Richardson
+    error estimate is within tol for every contract. The step counts are kept even, or odd
+    for Leisen-Reimer, so the odd-even wiggle does not spoil the estimate.
+    Returns a ResolutionResult whose resolution is the number of steps."""
+    order = 1 if american else RICHARDSON_ORDER[scheme]
+    resolutions = []
+    num_steps = start_steps
+    while num_steps <= max_steps:
+        steps = _step_count(scheme, num_steps)
+        if scheme != "leisen_reimer" and steps % 2:
+            steps += 1
+        resolutions.append((steps, steps))
+        num_steps *= 2
+    return refine_to_tolerance(
+        lambda steps: binomial_values(S, D, t, T, E, sigma, r, steps, option_type, american, scheme),
+        resolutions, tol, order,
+    )
+
+def convergence_report(S, D, t, T, E, sigma, r, option_type="call", steps=(25, 50, 100, 200, 400)) -> list:
+    """Error of each tree scheme, with and without Richardson extrapolation, against the
+    closed form European value. Returns (scheme, richardson, num_steps, value, error) rows."""
+    exact = float(black_scholes_value(S, D, t, T, E, sigma, r, option_type))
+    report = []
+    for scheme in TREE_SCHEMES:
+        for richardson in (False, True):
+            for num_steps in steps:
+                value = float(binomial_values(
+                    S, D, t, T, E, sigma, r, num_steps, option_type, scheme=scheme, richardson=richardson
+                ))
+                report.append((scheme, richardson, _step_count(scheme, num_steps), value, value - exact))
+    return report
+
+def get_binary_value(r, sigma, S, E, t, T, timesteps, deriv_type):
+    return float(binomial_values(S, 0, t, T, E, sigma, r, timesteps, deriv_type))
 
 if __name__ == '__main__':
     S = 60
@@ -39,5 +350,15 @@ if __name__ == '__main__':
     t = 45
     r = 0.05
     sigma = 0.1
-    V = get_binary_value(r, sigma, S, E, t, T, 500)
+    V = get_binary_value(r, sigma, S, E, t, T, 500, "call")
     print("V", V)
+    S_values = np.arange(1, 101)
+    print("American put", binomial_values(S_values, 0, t, T, E, sigma, r, 500, "put", american=True)[::10])
+    strikes = np.linspace(40, 60, 5)
+    print("Calls, puts and straddles on one lattice", binomial_chain_values(
+        S, 0, t, T, np.concatenate([strikes] * 3), sigma, r, 500, ["call"] * 5 + ["put"] * 5 + ["straddle"] * 5
+    ))
+    print("Greeks", binomial_greeks(S, 0, t, T, E, sigma, r, 500, "call"))
+    print("American put to 1e-3", binomial_values_to_tolerance(S, 0, t, T, E, sigma, r, 1e-3, "put", american=True))
+    for scheme, richardson, num_steps, value, error in convergence_report(100, 0, 0, 1, 100, 0.2, 0.05):
+        print(f"{scheme:>13} {'richardson' if richardson else '':>10} {num_steps:4d} {value:.6f} {error: .2e}")
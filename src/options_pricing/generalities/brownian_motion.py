@@ -1,18 +1,44 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import math
+from src.options_pricing.generalities.qmc import path_normals
+from src.options_pricing.generalities.random_streams import resolve_rng
 
-def brownian_motion_0_to_1(dt = 0.01, mu = 0, dX_dt_exp = 0.5):
-    """Brownian motion on an interval from t=0 to t=1."""
-    t = [i * dt for i in range(int(1/dt)+1)]
-    y = [None for i in range(int(1/dt)+1)]
-    y[0] = 0
+def brownian_paths(n_paths, n_steps, dt, mu=0.0, dX_dt_exp=0.5, x0=0.0, rng=None, normals=None,
+                   sampling="pseudo") -> np.ndarray:
+    """Paths X(t_k), t_k = k dt, of dX = mu dt + phi dt^dX_dt_exp with phi standard normal,
+    as an (n_paths x n_steps + 1) array starting from x0. All increments are drawn at once
+    and summed along each path. rng is a Generator, a RandomStream or a seed; normals, (n_paths x n_steps) standard normals, replaces the
+    draw, e.g. with those of a MonteCarloEstimator; otherwise sampling "sobol" builds the
+    paths from scrambled Sobol points in Brownian bridge order, see qmc.path_normals."""
+    if normals is None:
+        increments = path_normals(n_paths, n_steps, rng, sampling)
+    else:
+        increments = np.array(normals, dtype=float).reshape(n_paths, n_steps)
+    increments *= dt ** dX_dt_exp
+    increments += mu * dt
 
-    rng = np.random.default_rng()
+    paths = np.empty((n_paths, n_steps + 1))
+    paths[:, 0] = x0
+    np.cumsum(increments, axis=1, out=paths[:, 1:])
+    paths[:, 1:] += x0
+    return paths
 
-    for timestep in range(1, int(1/dt)+1):
-        y[timestep] = y[timestep-1] + mu * dt + rng.standard_normal() * math.pow(dt, dX_dt_exp)
+def brownian_path_chunks(n_paths, n_steps, dt, mu=0.0, dX_dt_exp=0.5, x0=0.0, chunk_size=1000, rng=None,
+                         sampling="pseudo"):
+    """Yield the paths of brownian_paths in blocks of at most chunk_size paths, so only one
+    block is in memory at a time. With the same rng the blocks stacked together are the
+    paths brownian_paths draws in one go. With sampling "sobol" each block is a separately
+    scrambled replicate. Workers filling chunks in parallel should each take their own
+    stream from random_streams.spawn_streams instead."""
+    rng = resolve_rng(rng)
+    for start in range(0, n_paths, chunk_size):
+        yield brownian_paths(min(chunk_size, n_paths - start), n_steps, dt, mu, dX_dt_exp, x0, rng, sampling=sampling)
 
+def brownian_motion_0_to_1(dt = 0.01, mu = 0, dX_dt_exp = 0.5):
+    """Brownian motion on an interval from t=0 to t=1."""
+    timestep_count = int(1/dt)
+    t = dt * np.arange(timestep_count + 1)
+    y = brownian_paths(1, timestep_count, dt, mu, dX_dt_exp)[0]
     return t, y
 
 if __name__=="__main__":
@@ -1,15 +1,63 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import statistics
+from typing import NamedTuple
+from src.options_pricing.generalities.qmc import path_normals
+from src.options_pricing.generalities.random_streams import resolve_rng
 
-def brownian_until_hit(init:float, barrier: float, mu:float, sigma:float, cutoff:int) -> int:
-    y = init
-    t = 0
-    rng = np.random.default_rng()
-    while y < barrier and t < cutoff:
-        y = y + mu + sigma * rng.standard_normal()
-        t += 1
-    return t
+class HittingTimes(NamedTuple):
+    """First hitting times of a barrier, one per path, with paths that never hit it
+    counted at the cutoff, as brownian_until_hit does, and hit False."""
+    times: np.ndarray
+    hit: np.ndarray
+    mean: float
+    median: float
+
+def first_hitting_times(init:float, barrier: float, mu:float, sigma:float, cutoff:float, n_paths:int,
+                        dt:float = 1.0, bridge:bool = True, rng=None, normals=None,
+                        sampling:str = "pseudo") -> HittingTimes:
+    """First times paths of dy = mu dt + sigma dX, started at init, reach barrier from below,
+    up to cutoff. All paths step together; the ones that hit are dropped from the working
+    arrays so later steps only draw for the paths still running.
+    With bridge, a path that ends a step below the barrier still counts as hitting it with
+    the Brownian bridge crossing probability exp(-2 (b - y_k)(b - y_k+1) / (sigma^2 dt)),
+    which removes the late bias of checking the barrier only at the steps.
+    rng is a Generator, a RandomStream or a seed.
+    normals, (n_paths x steps to cutoff) standard normals, replaces the draws of the path
+    increments, e.g. with those of a MonteCarloEstimator. sampling "sobol" draws them all
+    up front from scrambled Sobol points in Brownian bridge order, see qmc.path_normals."""
+    rng = resolve_rng(rng)
+    times = np.full(n_paths, float(cutoff))
+    if init >= barrier:
+        return HittingTimes(np.zeros(n_paths), np.ones(n_paths, dtype=bool), 0.0, 0.0)
+
+    # paths still running, by index into times, and where they are
+    active = np.arange(n_paths)
+    y = np.full(n_paths, float(init))
+    diffusion = sigma * np.sqrt(dt)
+    timestep_count = int(np.ceil(cutoff / dt - 1e-9))
+    if normals is None and sampling != "pseudo":
+        normals = path_normals(n_paths, timestep_count, rng, sampling)
+    for timestep in range(1, timestep_count + 1):
+        z = rng.standard_normal(len(active)) if normals is None else normals[active, timestep - 1]
+        y_new = y + mu * dt + diffusion * z
+        hit = y_new >= barrier
+        if bridge:
+            crossing = np.exp(-2 * (barrier - y) * (barrier - y_new) / (diffusion * diffusion))
+            hit |= rng.random(len(active)) < crossing
+        if hit.any():
+            times[active[hit]] = min(timestep * dt, cutoff)
+            active = active[~hit]
+            y_new = y_new[~hit]
+            if len(active) == 0:
+                break
+        y = y_new
+
+    hit = np.ones(n_paths, dtype=bool)
+    hit[active] = False
+    return HittingTimes(times, hit, float(times.mean()), float(np.median(times)))
+
+def brownian_until_hit(init:float, barrier: float, mu:float, sigma:float, cutoff:int, rng=None) -> int:
+    return int(first_hitting_times(init, barrier, mu, sigma, cutoff, 1, bridge=False, rng=rng).times[0])
 
 
 if __name__=='__main__':
@@ -19,18 +67,12 @@ if __name__=='__main__':
     x0=0
     cutoff = 10001
 
-    stopping_times = []
-    for i in range(1000):
-        latest_time = brownian_until_hit(x0, barrier, mu, sigma, cutoff)
-        stopping_times.append(latest_time)
+    stopping_times, _, mean_st, median_st = first_hitting_times(x0, barrier, mu, sigma, cutoff, 1000)
     print("simulations done")
-    mean_st = statistics.mean(stopping_times)
     print("mean stopping time",mean_st)
-    median_st = statistics.median(stopping_times)
     print("median stopping time",median_st)
 
     t_values = [10*i for i in range(1000)]
     plt.hist(stopping_times, bins=t_values)
     plt.title(f"Hitting time:\n mu={mu}, sigma={sigma}, barrier={barrier}, mean={mean_st}, median={median_st}")
     plt.show()
-
@@ -1,19 +1,33 @@
 import numpy as np
 import math
+from src.options_pricing.generalities.monte_carlo import MonteCarloEstimator, lognormal_mean
+from src.options_pricing.generalities.random_streams import resolve_rng
 
-def get_exponential_mean(n:int, mu:float, sigma:float) -> float:
+def get_exponential_mean(n:int, mu:float, sigma:float, rng=None) -> float:
     print(f"Create normal distribution ndarray of length {n} with average {mu:.5f} and std deviation {sigma:.5f}.")
-    rng = np.random.default_rng()
+    rng = resolve_rng(rng)
     orig = rng.normal(mu, sigma, n)
     orig_avg = orig.mean()
     orig_st_dev = orig.std()
     print(f"Realized ndarray has average {orig_avg:.5f} and std deviation {orig_st_dev:.5f}.")
     print("Exponentiate each element of the array.")
-    efunc = np.vectorize(lambda t: math.exp(t))
-    expo = efunc(orig)
+    expo = np.exp(orig)
     print(f"This results in a realized lognormal ndarray with average {expo.mean():.5f} and std deviation {expo.std():.5f}.")
-    print(f"Theoretically the lognormal ndarray should have average {math.exp(mu+0.5*sigma*sigma):.5f}")
+    print(f"Theoretically the lognormal ndarray should have average {lognormal_mean(mu, sigma):.5f}")
+    return expo.mean()
+
+def get_exponential_mean_to_error(target_error:float, mu:float, sigma:float, rng=None):
+    """E[exp(X)], X normal with mean mu and standard deviation sigma, to a target standard
+    error, with antithetic draws, 100 strata and the second order expansion of exp about mu,
+    whose mean e^mu (1 + sigma^2/2) is known, as control."""
+    estimator = MonteCarloEstimator(
+        lambda z: np.exp(mu + sigma * z[:, 0]), antithetic=True, strata=100,
+        control=lambda z: math.exp(mu) * (1 + sigma * z[:, 0] + 0.5 * (sigma * z[:, 0]) ** 2),
+        control_mean=math.exp(mu) * (1 + 0.5 * sigma * sigma), rng=rng)
+    return estimator.run_to_error(target_error)
 
 if __name__=='__main__':
     '''Demonstration of expectation of a function of a random variable.'''
-    get_exponential_mean(1000000, 2, 1)
\ No newline at end of file
+    get_exponential_mean(1000000, 2, 1)
+    estimate = get_exponential_mean_to_error(0.01, 2, 1)
+    print(f"Variance reduced estimate {estimate.value:.5f} +- {estimate.standard_error:.5f} from {estimate.samples} samples.")
\ No newline at end of file
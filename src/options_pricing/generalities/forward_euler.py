@@ -1,61 +1,69 @@
 import matplotlib.pyplot as plt
 import math
+import numpy as np
+from src.options_pricing.generalities.resolution import ResolutionResult, refine_to_tolerance
+from src.options_pricing.generalities.heat_equation import PDESolution, SliceRecorder, grid_greeks, heat_boundaries, heat_grid, heat_parameters, heat_payoff, record_taus, second_difference, to_dimensional
 
-def forward_euler(r, sigma, E, S_min, S_max, make_graph, option_type):
+def stable_timestep(x_values, final_time) -> (float, int):
+    """Largest stable timestep that divides final_time exactly: every new value must be a
+    positive combination of old ones, dt (l + r) <= 1, which is dt / dx^2 <= 1/2 on a
+    uniform grid. Returns (dt, number of timesteps)."""
+    _, m, _ = second_difference(x_values)
+    timestep_count = max(1, math.ceil(final_time * np.max(-m)))
+    return final_time / timestep_count, timestep_count
+
+def forward_euler(r, sigma, E, S_min, S_max, make_graph, option_type="call", x_mesh=1000, final_time=0.025, dt=None,
+                  record=None, method="cubic", cluster=None, cluster_width=0.1, return_greeks=False):
     """Convert Black Scholes to non-dimensional heat equation,
-    and solve using forward Euler, following Wilmott."""
+    and solve using forward Euler, following Wilmott.
+    The grid runs from S = 1 to S_max with x_mesh intervals in x = log(S/E), and the
+    solution is advanced to the dimensionless time final_time = sigma^2 (T - t) / 2.
+    cluster, asset prices such as the strike and barrier levels, concentrates the nodes
+    around them on a clustered_grid of width cluster_width in x.
+    By default dt is the largest stable step; a given dt must keep dt / dx^2 <= 1/2.
+    With record, every record-th step or the tau values in record, the solve instead
+    returns a PDESolution holding those time slices, interpolated with method.
+    return_greeks appends (delta, gamma, theta) on the grid, from grid_greeks, aligned with V."""
 
     # rescale to non-dimensional variables
-    alpha = -1/2 * (2 * r / (sigma * sigma) - 1)
-    beta = -1/4 * (2 * r / (sigma * sigma) + 1) * (2 * r / (sigma * sigma) + 1)
+    alpha, beta, k = heat_parameters(r, sigma)
     Nminus = math.log(1/E)
     Nplus = math.log(S_max/E)
-    x_mesh = 1000
-    dx = (Nplus - Nminus)/x_mesh
-    dt = 0.01 * dx * dx # extremely small timestep for accuracy
-
-    x_values = [Nminus + dx * i for i in range(x_mesh +1)]
-
-    # initial condition
-    #u_old = [ max(0, math.exp(-alpha * x_values[i]) * (math.exp(x_values[i]) - 1)) for i in range(x_mesh +1)]
+    x_values = heat_grid(Nminus, Nplus, x_mesh, E, cluster, cluster_width)
+    if dt is None:
+        dt, timestep_count = stable_timestep(x_values, final_time)
+    else:
+        timestep_count = max(1, round(final_time / dt))
+        dt = final_time / timestep_count
+        if dt > stable_timestep(x_values, final_time)[0] * (1 + 1e-12):
+            raise ValueError(f"Forward Euler is unstable for dt = {dt}, the stable limit is {stable_timestep(x_values, final_time)[0]}")
+    left, centre, right = (dt * c for c in second_difference(x_values))
+    centre += 1
 
-    if option_type == "call":
-        u_old = [ max(0, math.exp(-alpha * x_values[i]) * (math.exp(x_values[i]) - 1)) for i in range(x_mesh +1)]
-    if option_type == "put":
-        u_old = [ max(math.exp(-alpha * x_values[i]) * (- math.exp(x_values[i]) + 1), 0) for i in range(x_mesh +1)]
-    if option_type == "straddle":
-        u_old = [ max(math.exp(-alpha * x_values[i]) * (- math.exp(x_values[i]) + 1), math.exp(-alpha * x_values[i]) * (math.exp(x_values[i]) - 1)) for i in range(x_mesh +1)]
-    u = [None for i in range(x_mesh +1)]
+    # initial condition, and Dirichlet values at both ends for every timestep
+    u = heat_payoff(x_values, alpha, option_type)
+    tau_values = dt * np.arange(timestep_count + 1)
+    u_min, u_max = heat_boundaries(Nminus, Nplus, tau_values, alpha, beta, k, option_type)
+    recorder = None if record is None else SliceRecorder(tau_values, record_taus(tau_values, record), u.shape)
+    if recorder is not None:
+        recorder.start(u)
 
     # option to graph
     if make_graph==1:
-        plt.plot(x_values, u_old.copy())
+        plt.plot(x_values, u.copy())
 
-    # solve using Forward Euler
-    timestep_alpha = dt / (dx * dx)
-    final_time = 0.025
-    timestep_count = int(final_time/dt)
-    for timestep in range(timestep_count + 1):
-        tau = final_time / timestep_count * timestep
-        if option_type == "call":
-            u_min = 0
-        else:
-            u_min = math.exp(-alpha * Nminus) * math.exp(-beta * tau) * (-math.exp(Nminus) + math.exp(-2*r/sigma/sigma*tau))
-        u_max = math.exp(-alpha * Nplus) * math.exp(-beta * tau) * (math.exp(Nplus) - math.exp(-2*r/sigma/sigma*tau))
-        for ii in range(0, len(u)):
-            if ii==0:
-                u[ii] = u_old[ii] + timestep_alpha * (
-                    u_min - 2 * u_old[ii] + u_old[ii+1]
-                )
-            elif ii==len(u) - 1:
-                u[ii] = u_old[ii] + timestep_alpha * (
-                    u_old[ii-1] - 2 * u_old[ii] + u_max
-                )
-            else:
-                u[ii] = u_old[ii] + timestep_alpha * (
-                    u_old[ii-1] - 2 * u_old[ii] + u_old[ii+1]
-                )
-        u_old = u
+    # solve using Forward Euler, alternating between two buffers
+    u_new = np.empty_like(u)
+    for timestep in range(1, timestep_count + 1):
+        inner = u_new[1:-1]
+        np.multiply(left, u[:-2], out=inner)
+        inner += right * u[2:]
+        inner += centre * u[1:-1]
+        u_new[0] = u_min[timestep]
+        u_new[-1] = u_max[timestep]
+        u, u_new = u_new, u
+        if recorder is not None:
+            recorder.step(timestep, u_new, u)
 
     # option to graph
     if make_graph==1:
@@ -64,9 +72,24 @@ def forward_euler(r, sigma, E, S_min, S_max, make_graph, option_type):
         plt.show()
 
     # convert back to dimensional variables
-    return_S = [E * math.exp(x_values[i]) for i in range(x_mesh +1)]
-    return_V = [E * math.exp(alpha * x_values[i]) * u[i] * math.exp(beta * tau) for i in range(x_mesh +1)]
-    return return_S, return_V
+    if recorder is not None:
+        return PDESolution(x_values, recorder.taus, recorder.history[:, :, None], E, alpha, beta, sigma, method=method)
+    if return_greeks:
+        return to_dimensional(x_values, u, final_time, E, alpha, beta) + (grid_greeks(x_values, u, final_time, E, alpha, beta, sigma),)
+    return to_dimensional(x_values, u, final_time, E, alpha, beta)
+
+def forward_euler_to_tolerance(r, sigma, E, S_max, S, tol, option_type="call", final_time=0.025, x_mesh=100,
+                               max_refinements=5) -> ResolutionResult:
+    """Values at the asset prices S from the coarsest grid, doubling x_mesh from the one
+    given, whose Richardson error estimate is within tol. The timestep follows the stable
+    limit, dt ~ dx^2, so the error is second order in dx.
+    Returns a ResolutionResult whose resolution is x_mesh."""
+    def values_at(x_mesh):
+        S_values, V_values = forward_euler(r, sigma, E, 0, S_max, 0, option_type, x_mesh=x_mesh, final_time=final_time)
+        return np.interp(S, S_values, V_values)
+
+    resolutions = [(x_mesh * 2 ** i, 2 ** i) for i in range(max_refinements + 1)]
+    return refine_to_tolerance(values_at, resolutions, tol, 2)
 
 if __name__ == '__main__':
     """Example of forward Euler calculation."""
@@ -77,4 +100,4 @@ if __name__ == '__main__':
     r = 0.05
 
     # note for forward_euler plotting takes place in dimensionless variables
-    forward_euler(r, sigma, E, S_min, S_max, 1)
\ No newline at end of file
+    forward_euler(r, sigma, E, S_min, S_max, 1, "call")
@@ -1,13 +1,13 @@
+import numpy as np
+
 def delta(x_vector, y_vector):
-    """Calc delta of function given, i.e. dy/dx."""
+    """Calc delta of function given, i.e. dy/dx.
+    For prices straight from a PDE solve, heat_equation.grid_greeks gives delta, gamma
+    and theta without a separate pass."""
     # Assume x_vector and y_vector have same lengths.
-    x_return = x_vector[1:len(x_vector) - 1]
+    x_vector = np.asarray(x_vector, dtype=float)
+    y_vector = np.asarray(y_vector, dtype=float)
 
     # Average forward and backward first difference
-    y_return = []
-    for i in range(1, len(x_vector) - 1):
-        y_return.append(
-                0.5 * (y_vector[i] - y_vector[i - 1]) / (x_vector[i] - x_vector[i - 1]) +
-                0.5 * (y_vector[i + 1] - y_vector[i]) / (x_vector[i + 1] - x_vector[i])
-        )
-    return x_return, y_return
+    slopes = np.diff(y_vector) / np.diff(x_vector)
+    return x_vector[1:-1], 0.5 * (slopes[:-1] + slopes[1:])
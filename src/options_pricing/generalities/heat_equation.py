@@ -0,0 +1,293 @@
+import numpy as np
+from scipy.interpolate import CubicSpline, PchipInterpolator, RectBivariateSpline
+
+def heat_parameters(r, sigma) -> (float, float, float):
+    """Constants of the change of variables S = E e^x, t = T - 2 tau / sigma^2,
+    V = E e^(alpha x + beta tau) u(x, tau) that turns Black Scholes into the heat
+    equation, following Wilmott. Returns (alpha, beta, k) with k = 2 r / sigma^2."""
+    k = 2 * r / (sigma * sigma)
+    alpha = -1/2 * (k - 1)
+    beta = -1/4 * (k + 1) * (k + 1)
+    return alpha, beta, k
+
+def clustered_grid(x_min, x_max, x_mesh, centres=(0.0,), width=0.1) -> np.ndarray:
+    """x_mesh + 1 nodes on [x_min, x_max] concentrated around the given centres, e.g. the
+    log strike and barrier levels. The node density is proportional to the sum over the
+    centres of 1 / sqrt(1 + ((x - c) / width)^2), which for one centre is the sinh grid of
+    Tavella and Randall; the node nearest each centre is then moved onto it."""
+    centres = np.atleast_1d(np.asarray(centres, dtype=float))
+    fine = np.linspace(x_min, x_max, 20 * x_mesh + 1)
+    # the cumulative density, in closed form
+    cumulative = sum(width * np.arcsinh((fine - c) / width) for c in centres)
+    x_values = np.interp(np.linspace(cumulative[0], cumulative[-1], x_mesh + 1), cumulative, fine)
+    x_values[0], x_values[-1] = x_min, x_max
+    for c in centres:
+        i = np.argmin(np.abs(x_values - c))
+        if 0 < i < x_mesh and x_min < c < x_max:
+            x_values[i] = c
+    return x_values
+
+def heat_grid(x_min, x_max, x_mesh, E, cluster=None, cluster_width=0.1) -> np.ndarray:
+    """The solvers' grid in x = log(S/E): uniform, or clustered around the asset prices in cluster."""
+    if cluster is None:
+        return np.linspace(x_min, x_max, x_mesh + 1)
+    return clustered_grid(x_min, x_max, x_mesh, np.log(np.asarray(cluster, dtype=float) / E), cluster_width)
+
+def second_difference(x_values) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Coefficients (l, m, r) of the three point approximation
+    u_xx ~ l u[i-1] + m u[i] + r u[i+1] at the interior nodes of a possibly nonuniform grid."""
+    h = np.diff(x_values)
+    h_minus, h_plus = h[:-1], h[1:]
+    l = 2 / (h_minus * (h_minus + h_plus))
+    r = 2 / (h_plus * (h_minus + h_plus))
+    return l, -(l + r), r
+
+def first_difference(x_values) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Coefficients (l, m, r) of the second order three point approximation
+    u_x ~ l u[i-1] + m u[i] + r u[i+1] at the interior nodes of a possibly nonuniform grid."""
+    h = np.diff(x_values)
+    h_minus, h_plus = h[:-1], h[1:]
+    l = -h_plus / (h_minus * (h_minus + h_plus))
+    r = h_minus / (h_plus * (h_minus + h_plus))
+    return l, -(l + r), r
+
+def grid_greeks(x_values, u, tau, E, alpha, beta, sigma, exercised=None) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Delta, gamma and theta = dV/dt on the grid of a solution u (nodes, or nodes x columns)
+    at time tau, from three point differences in x and the chain rule through
+    V = E e^(alpha x + beta tau) u and S = E e^x. u_tau is u_xx by the heat equation, so no
+    earlier time slice is needed; theta is zero on the nodes marked exercised. The end
+    nodes take the derivatives of their neighbours. Arrays are aligned with the grid."""
+    u = np.asarray(u, dtype=float)
+    columns = u.reshape(len(x_values), -1)
+    first = first_difference(x_values)
+    second = second_difference(x_values)
+    u_x = np.empty_like(columns)
+    u_xx = np.empty_like(columns)
+    u_x[1:-1] = sum(c[:, None] * columns[i:len(columns) - 2 + i] for i, c in enumerate(first))
+    u_xx[1:-1] = sum(c[:, None] * columns[i:len(columns) - 2 + i] for i, c in enumerate(second))
+    # one sided at the ends, using the neighbouring curvature
+    h_first, h_last = x_values[1] - x_values[0], x_values[-1] - x_values[-2]
+    u_xx[0], u_xx[-1] = u_xx[1], u_xx[-2]
+    u_x[0] = (columns[1] - columns[0]) / h_first - 0.5 * h_first * u_xx[0]
+    u_x[-1] = (columns[-1] - columns[-2]) / h_last + 0.5 * h_last * u_xx[-1]
+
+    S = E * np.exp(x_values)[:, None]
+    scale = E * np.exp(alpha * x_values + beta * tau)[:, None]
+    V_x = scale * (alpha * columns + u_x)
+    V_xx = scale * (alpha * alpha * columns + 2 * alpha * u_x + u_xx)
+    delta = V_x / S
+    gamma = (V_xx - V_x) / (S * S)
+    theta = -0.5 * sigma * sigma * scale * (beta * columns + u_xx)
+    if exercised is not None:
+        theta[np.asarray(exercised).reshape(theta.shape)] = 0.0
+    return tuple(a.reshape(u.shape) for a in (delta, gamma, theta))
+
+def heat_payoff(x, alpha, option_type, strike_ratio=1.0) -> np.ndarray:
+    """Initial condition u(x, 0) for a call, put or straddle. A strike K other than the
+    E of the change of variables enters through strike_ratio = K / E."""
+    x = np.asarray(x, dtype=float)
+    call = np.maximum(np.exp(x) - strike_ratio, 0)
+    put = np.maximum(strike_ratio - np.exp(x), 0)
+    if option_type == "call":
+        payoff = call
+    elif option_type == "put":
+        payoff = put
+    elif option_type == "straddle":
+        payoff = call + put
+    else:
+        raise ValueError(f"Unknown option type {option_type}")
+    return np.exp(-alpha * x) * payoff
+
+def heat_boundaries(x_min, x_max, tau, alpha, beta, k, option_type, strike_ratio=1.0) -> (np.ndarray, np.ndarray):
+    """Dirichlet values of u at x_min and x_max for the times tau. A call is worthless at
+    x_min and S - K e^(-r (T-t)) at x_max, a put is the reverse, a straddle is their sum."""
+    tau = np.asarray(tau, dtype=float)
+    discounted_strike = strike_ratio * np.exp(-k * tau)
+    scale = np.exp(-beta * tau)
+    zero = np.zeros_like(tau)
+    lower = np.exp(-alpha * x_min) * scale * (discounted_strike - np.exp(x_min))
+    upper = np.exp(-alpha * x_max) * scale * (np.exp(x_max) - discounted_strike)
+    if option_type == "call":
+        return zero, upper
+    elif option_type == "put":
+        return lower, zero
+    elif option_type == "straddle":
+        return lower, upper
+    raise ValueError(f"Unknown option type {option_type}")
+
+def to_dimensional(x, u, tau, E, alpha, beta) -> (np.ndarray, np.ndarray):
+    """Convert a solution u(x, tau) back to asset prices S and option values V."""
+    x = np.asarray(x, dtype=float)
+    return E * np.exp(x), E * np.exp(alpha * x + beta * tau) * u
+
+def heat_columns(x_min, x_max, x, tau, alpha, beta, k, option_types, strike_ratios) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Payoffs and boundary values of several contracts solved side by side, one column
+    per contract. option_types and strike_ratios broadcast together into the columns.
+    Returns u0 (nodes x columns) and the lower and upper values (times x columns)."""
+    option_types, strike_ratios = np.broadcast_arrays(np.asarray(option_types), np.asarray(strike_ratios, dtype=float))
+    option_types, strike_ratios = option_types.ravel(), strike_ratios.ravel()
+    tau = np.asarray(tau, dtype=float)
+    u0 = np.empty((len(x), len(strike_ratios)))
+    lower = np.empty((len(tau), len(strike_ratios)))
+    upper = np.empty((len(tau), len(strike_ratios)))
+    for j, (option_type, strike_ratio) in enumerate(zip(option_types, strike_ratios)):
+        u0[:, j] = heat_payoff(x, alpha, option_type, strike_ratio)
+        lower[:, j], upper[:, j] = heat_boundaries(x_min, x_max, tau, alpha, beta, k, option_type, strike_ratio)
+    return u0, lower, upper
+
+def record_taus(tau_values, record) -> np.ndarray:
+    """The tau values to record for a record argument: an int k records every k-th time
+    level and the last one, a sequence gives the tau values themselves, sorted and with
+    repeats recorded once."""
+    if isinstance(record, (int, np.integer)):
+        if record < 1:
+            raise ValueError(f"Record every k-th step needs k >= 1, got {record}")
+        levels = np.arange(0, len(tau_values), record)
+        if levels[-1] != len(tau_values) - 1:
+            levels = np.append(levels, len(tau_values) - 1)
+        return tau_values[levels]
+    taus = np.unique(np.asarray(record, dtype=float))
+    if taus[0] < 0 or taus[-1] > tau_values[-1] * (1 + 1e-12):
+        raise ValueError(f"Recorded tau values must lie in [0, {tau_values[-1]}]")
+    return taus
+
+class SliceRecorder:
+    """Records the solution at given tau values into one preallocated array
+    (slices x nodes x columns) while a solver marches through its time levels.
+    A slice between two levels is interpolated linearly from them."""
+
+    def __init__(self, tau_values, taus, shape):
+        self.tau_values = tau_values
+        self.taus = taus
+        self.history = np.empty((len(taus),) + tuple(shape))
+        self._next = 0
+
+    def start(self, u) -> None:
+        self.step(0, u, u)
+
+    def step(self, level, u_previous, u) -> None:
+        """Record the slices up to the time level just reached, u_previous being level - 1."""
+        tau = self.tau_values[level]
+        while self._next < len(self.taus) and self.taus[self._next] <= tau * (1 + 1e-12):
+            if level == 0 or self.taus[self._next] >= tau:
+                self.history[self._next] = u
+            else:
+                tau_previous = self.tau_values[level - 1]
+                weight = (self.taus[self._next] - tau_previous) / (tau - tau_previous)
+                np.multiply(u_previous, 1 - weight, out=self.history[self._next])
+                self.history[self._next] += weight * u
+            self._next += 1
+
+class PDESolution:
+    """Solution of a Black Scholes PDE solve recorded at several time slices, with values
+    and Greeks at arbitrary asset prices and times to expiry by interpolation in (x, tau).
+    u has shape (slices x nodes x columns), one column per contract solved together.
+    method "cubic" is a bicubic spline, "monotone" a shape preserving PCHIP in x with
+    linear interpolation in tau, which never overshoots near the kink of a payoff.
+    A single slice is interpolated in x only."""
+
+    def __init__(self, x_values, taus, u, E, alpha, beta, sigma, columns_given=False, method="cubic"):
+        if method not in ("cubic", "monotone"):
+            raise ValueError(f"Unknown interpolation method {method}")
+        self.x_values = x_values
+        self.taus = taus
+        self.u = u
+        self.E = E
+        self.alpha = alpha
+        self.beta = beta
+        self.sigma = sigma
+        self.columns_given = columns_given
+        self.method = method
+        self._interpolants = None
+
+    @property
+    def S_values(self) -> np.ndarray:
+        return self.E * np.exp(self.x_values)
+
+    @property
+    def times_to_expiry(self) -> np.ndarray:
+        """T - t of each recorded slice."""
+        return 2 * self.taus / (self.sigma * self.sigma)
+
+    @property
+    def V(self) -> np.ndarray:
+        """Option values on the grid, (slices x nodes), with a trailing axis of columns if
+        several contracts were solved together."""
+        scale = self.E * np.exp(self.alpha * self.x_values[None, :] + self.beta * self.taus[:, None])
+        V = scale[:, :, None] * self.u
+        return V if self.columns_given else V[:, :, 0]
+
+    def _interpolate(self, x, tau, dx=0, dtau=0) -> np.ndarray:
+        """Derivative (dx, dtau) of u at the points (x, tau), one trailing column per contract."""
+        bicubic = self.method == "cubic" and len(self.taus) > 1
+        if self._interpolants is None:
+            if bicubic:
+                self._interpolants = [
+                    RectBivariateSpline(self.taus, self.x_values, self.u[:, :, j], kx=min(3, len(self.taus) - 1), ky=3)
+                    for j in range(self.u.shape[2])
+                ]
+            elif self.method == "cubic":
+                self._interpolants = CubicSpline(self.x_values, self.u, axis=1)
+            else:
+                self._interpolants = PchipInterpolator(self.x_values, self.u, axis=1)
+
+        if bicubic:
+            return np.stack([spline.ev(tau, x, dx=dtau, dy=dx) for spline in self._interpolants], axis=-1)
+        along_x = self._interpolants(x, nu=dx)  # (slices, *points, columns)
+        if len(self.taus) == 1:
+            if dtau:
+                raise ValueError("Time derivatives need more than one recorded slice")
+            return along_x[0]
+
+        # linear in tau between the two slices around each point
+        n = np.clip(np.searchsorted(self.taus, tau, side="right") - 1, 0, len(self.taus) - 2)
+        width = (self.taus[n + 1] - self.taus[n])[..., None]
+        points = np.indices(x.shape)
+        lower, upper = along_x[(n, *points)], along_x[(n + 1, *points)]
+        if dtau:
+            return (upper - lower) / width
+        weight = (tau - self.taus[n])[..., None] / width
+        return (1 - weight) * lower + weight * upper
+
+    def _points(self, S, time_to_expiry):
+        S, time_to_expiry = np.broadcast_arrays(np.asarray(S, dtype=float), np.asarray(time_to_expiry, dtype=float))
+        x = np.log(S / self.E)
+        tau = 0.5 * self.sigma * self.sigma * time_to_expiry
+        if np.any((tau < self.taus[0] * (1 - 1e-12)) | (tau > self.taus[-1] * (1 + 1e-12))):
+            raise ValueError(f"Times to expiry outside the recorded range [{self.times_to_expiry[0]}, {self.times_to_expiry[-1]}]")
+        if np.any((x < self.x_values[0]) | (x > self.x_values[-1])):
+            raise ValueError("Asset prices outside the grid")
+        return S, x, tau, self.E * np.exp(self.alpha * x + self.beta * tau)[..., None]
+
+    def _columns(self, a) -> np.ndarray:
+        return a if self.columns_given else a[..., 0]
+
+    def value(self, S, time_to_expiry) -> np.ndarray:
+        """Values at asset prices S and times to expiry T - t, broadcast together."""
+        S, x, tau, scale = self._points(S, time_to_expiry)
+        return self._columns(scale * self._interpolate(x, tau))
+
+    def grid_greeks(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """Delta, gamma and theta on the grid at every recorded slice, shaped like V."""
+        greeks = [grid_greeks(self.x_values, u, tau, self.E, self.alpha, self.beta, self.sigma)
+                  for u, tau in zip(self.u, self.taus)]
+        return tuple(self._columns(np.stack([g[i] for g in greeks])) for i in range(3))
+
+    def greeks(self, S, time_to_expiry) -> (np.ndarray, np.ndarray, np.ndarray):
+        """Delta, gamma and theta = dV/dt from derivatives of the interpolant, by the
+        chain rule through V = E e^(alpha x + beta tau) u, x = log(S/E) and tau = sigma^2 (T-t) / 2."""
+        S, x, tau, scale = self._points(S, time_to_expiry)
+        S = S[..., None]
+        u = self._interpolate(x, tau)
+        u_x = self._interpolate(x, tau, dx=1)
+        u_xx = self._interpolate(x, tau, dx=2)
+        V_x = scale * (self.alpha * u + u_x)
+        V_xx = scale * (self.alpha * self.alpha * u + 2 * self.alpha * u_x + u_xx)
+        delta = V_x / S
+        gamma = (V_xx - V_x) / (S * S)
+        if len(self.taus) > 1:
+            V_tau = scale * (self.beta * u + self._interpolate(x, tau, dtau=1))
+            theta = -0.5 * self.sigma * self.sigma * V_tau
+        else:
+            theta = np.full_like(delta, np.nan)
+        return self._columns(delta), self._columns(gamma), self._columns(theta)
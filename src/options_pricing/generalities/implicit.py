@@ -1,73 +1,328 @@
 import matplotlib.pyplot as plt
 import math
+import numpy as np
+from scipy.linalg.lapack import dgttrf, dgttrs, dtbtrs
+from src.options_pricing.generalities.resolution import ResolutionResult, refine_to_tolerance
+from src.options_pricing.generalities.heat_equation import (
+    PDESolution, SliceRecorder, grid_greeks, heat_boundaries, heat_columns, heat_grid, heat_parameters, heat_payoff,
+    record_taus, second_difference, to_dimensional,
+)
 
-def lu_find_y(y, timestep_alpha):
-    '''Find y on main diagonal of U matrix.'''
-    timestep_alpha_squared = timestep_alpha * timestep_alpha
-    y[0] = 1 + 2 * timestep_alpha
-    for i in range(1, len(y)):
-        y[i] = (1 + 2 * timestep_alpha) - timestep_alpha_squared / y[i-1]
-    return
+def factor_heat_operator(stencil, theta):
+    """LU factorization, by LAPACK dgttrf, of the tridiagonal matrix I - theta A on the
+    interior nodes, where A u = l u[i-1] + m u[i] + r u[i+1] and stencil = (l, m, r) are
+    the second_difference coefficients times the timestep."""
+    l, m, r = stencil
+    dl, d, du, du2, ipiv, info = dgttrf(-theta * l[1:], 1 - theta * m, -theta * r[:-1])
+    if info != 0:
+        raise np.linalg.LinAlgError(f"Singular heat operator, dgttrf info {info}")
+    return dl, d, du, du2, ipiv
+
+def factor_projected_operator(stencil, theta):
+    """Factorization of I - theta A for brennan_schwartz_solve. The elimination runs down
+    from the top node, so that the substitution runs up from x_min, where a put is exercised.
+    It is the LU factorization, by LAPACK dgttrf, of the matrix with the node order reversed;
+    diagonal dominance means no rows are interchanged. Returned as the sub-diagonal and the
+    LAPACK band storage of the two bidiagonal factors, the unit upper one for the
+    elimination and the lower one, with the pivots on its diagonal, for the substitution."""
+    l, m, r = stencil
+    lower, diagonal, upper = -theta * l, 1 - theta * m, -theta * r
+    _, pivots, _, _, ipiv, info = dgttrf(upper[:-1][::-1], diagonal[::-1], lower[1:][::-1])
+    if info != 0 or np.any(ipiv != np.arange(1, len(diagonal) + 1)):
+        raise np.linalg.LinAlgError(f"Projected heat operator is not diagonally dominant, dgttrf info {info}")
+    pivots = pivots[::-1]
+    elimination = np.vstack([np.append(0, upper[:-1] / pivots[1:]), np.ones_like(pivots)])
+    substitution = np.vstack([pivots, np.append(lower[1:], 0)])
+    return lower, elimination, substitution
+
+def brennan_schwartz_solve(factorization, rhs, obstacle) -> (np.ndarray, np.ndarray):
+    """Solve the linear complementarity problem of early exercise, M u >= rhs, u >= obstacle
+    with equality in one of them at every node, directly: Brennan and Schwartz (1977)
+    project each value onto the obstacle as it is substituted up from x_min, which is exact
+    when the exercise region is an interval at the bottom of the grid, as for a put.
+    Inside that interval u[i-1] is the obstacle, so the substituted values are found for
+    all nodes at once; the first node where one clears the obstacle starts the continuation
+    region, which is one LAPACK bidiagonal solve per column.
+    rhs and obstacle are (nodes x columns). Returns u and the mask of exercised nodes."""
+    lower, elimination, substitution = factorization
+    g = dtbtrs(elimination, rhs, uplo="U", diag="U")[0]
+    pivots = substitution[0][:, None]
+    with np.errstate(invalid="ignore"):
+        candidate = g / pivots
+        candidate[1:] -= lower[1:, None] * obstacle[:-1] / pivots[1:]
+    # first node of the continuation region in each column, len(rhs) when all are exercised
+    continuation = candidate > obstacle
+    boundary = np.where(continuation.any(axis=0), np.argmax(continuation, axis=0), len(rhs))
 
-def lu_solver(u, b, y, timestep_alpha, Nminus, Nplus):
-    '''One timestep of LU decomposition.
-    Must have run lu_find_y first to set up y.'''
+    u = obstacle.copy()
+    for column, k in enumerate(boundary):
+        if k == len(rhs):
+            continue
+        block = g[k:, column].copy()
+        if k > 0:
+            block[0] -= lower[k] * obstacle[k - 1, column]
+        u[k:, column] = dtbtrs(substitution[:, k:], block[:, None], uplo="L", overwrite_b=1)[0][:, 0]
+    exercised = (np.arange(len(rhs))[:, None] < boundary) & (obstacle > 0)
+    return u, exercised
 
-    # solve Lq = b
-    q = [None for _ in range(len(b))]
-    q[0] = b[0]
-    for n in range(1, len(q)):
-        q[n] = b[n] + timestep_alpha * q[n-1] / y[n-1]
+def theta_step(u, u_new, factorization, stencil, theta, lower, upper, obstacle=None):
+    """One step of the theta scheme for u_tau = u_xx on the columns of u (nodes x columns),
+    theta = 1 is backward Euler and theta = 1/2 Crank-Nicolson. lower and upper are the
+    Dirichlet values at the new time; the result is written to u_new.
+    With an obstacle (nodes x columns), u is kept above it by brennan_schwartz_solve,
+    factorization then coming from factor_projected_operator, and the exercised interior
+    nodes are returned."""
+    l, m, r = (c[:, None] for c in stencil)
+    rhs = l * u[:-2]
+    rhs += m * u[1:-1]
+    rhs += r * u[2:]
+    rhs *= 1 - theta
+    rhs += u[1:-1]
+    rhs[0] += theta * l[0] * lower
+    rhs[-1] += theta * r[-1] * upper
+    exercised = None
+    if obstacle is None:
+        u_new[1:-1] = dgttrs(*factorization, rhs, overwrite_b=1)[0]
+    else:
+        u_new[1:-1], exercised = brennan_schwartz_solve(factorization, rhs, obstacle[1:-1])
+    u_new[0] = lower
+    u_new[-1] = upper
+    return exercised
 
-    # solve Uu = q
-    u[-1] = q[-1] / y[-1]
-    for n in range(len(u) - 2, -1, -1):
-        u[n] = (q[n] + timestep_alpha * u[n+1]) / y[n]
+def time_levels(final_time, dt, theta, rannacher_steps) -> (np.ndarray, int):
+    """The tau values of a march to final_time with steps of about dt, the first
+    rannacher_steps of them split into two backward Euler half steps.
+    Returns (tau_values, the number of Rannacher steps actually taken)."""
+    timestep_count = max(1, round(final_time / dt))
+    dt = final_time / timestep_count
+    rannacher_steps = min(rannacher_steps, timestep_count) if theta != 1 else 0
+    half_steps = dt * np.arange(0.5, rannacher_steps, 0.5)
+    return np.concatenate([[0], half_steps, dt * np.arange(rannacher_steps, timestep_count + 1)]), rannacher_steps
 
-    return
+def theta_march(u, lower, upper, stencil, theta, rannacher_steps, recorder=None, obstacle=None, exercise_index=None) -> np.ndarray:
+    """March the columns of u (nodes x columns) through the time levels of time_levels,
+    lower and upper holding the boundary values at each level (levels x columns), and
+    stencil the second_difference coefficients times the full timestep.
+    The operator is factorized once per kind of step. A SliceRecorder, if given, is
+    handed every level. For early exercise, obstacle(level) gives the exercise value of u
+    at each level, and the index of the highest node of the exercise region at each level
+    is written to exercise_index (levels x columns), 0 when only x_min is exercised."""
+    u = u.copy()
+    u_new = np.empty_like(u)
+    if recorder is not None:
+        recorder.start(u)
+    factor = factor_heat_operator if obstacle is None else factor_projected_operator
+    factorization = factor(stencil, theta)
+    if rannacher_steps:
+        half_stencil = tuple(c / 2 for c in stencil)
+        half_factorization = factor(half_stencil, 1.0)
+    if exercise_index is not None:
+        exercise_index[0] = np.argmin(obstacle(0)[1:-1] > 0, axis=0)
+    for level in range(1, len(lower)):
+        level_obstacle = None if obstacle is None else obstacle(level)
+        if level <= 2 * rannacher_steps:
+            exercised = theta_step(u, u_new, half_factorization, half_stencil, 1.0, lower[level], upper[level], level_obstacle)
+        else:
+            exercised = theta_step(u, u_new, factorization, stencil, theta, lower[level], upper[level], level_obstacle)
+        if exercise_index is not None:
+            # the first interior node that is not exercised lies just above the boundary
+            exercise_index[level] = np.where(exercised.all(axis=0), len(exercised), np.argmin(exercised, axis=0))
+        u, u_new = u_new, u
+        if recorder is not None:
+            recorder.step(level, u_new, u)
+    return u
 
-def backward_euler(r, sigma, E, S_min, S_max):
+def crank_nicolson(r, sigma, E, S_min, S_max, option_type="call", strikes=None, x_mesh=1000,
+                   final_time=0.025, dt=0.001, theta=0.5, rannacher_steps=2, record=None, method="cubic",
+                   cluster=None, cluster_width=0.1, american=False, return_greeks=False):
+    """Convert Black Scholes to non-dimensional heat equation, and solve using the
+    theta scheme, Crank-Nicolson by default, following Wilmott.
+    The tridiagonal operator is factorized once and every step is one LAPACK solve for all
+    columns: option_type (call, put, straddle or a sequence of them) and strikes (E by
+    default) broadcast together into one column per contract on the same grid in x = log(S/E).
+    The first rannacher_steps steps are each taken as two backward Euler half steps, which
+    damps the oscillations Crank-Nicolson leaves behind from the kink of the payoff.
+    Returns S and V, V with one column per contract unless both arguments are scalars.
+    With record, every record-th step or the tau values in record, the solve instead
+    returns a PDESolution holding those time slices, interpolated with method.
+    cluster, asset prices such as the strikes and barrier levels, concentrates the nodes
+    around them on a clustered_grid of width cluster_width in x.
+    american puts are priced by a projected Brennan-Schwartz solve each step, with no
+    iterations; without dividends an American call is worth the European one, so calls
+    are solved unconstrained. The early exercise boundary is then also returned, after V:
+    the critical asset price k timesteps before expiry in row k (one column per contract).
+    return_greeks appends (delta, gamma, theta) on the grid, from grid_greeks, aligned with
+    V; a recorded PDESolution offers the same through its grid_greeks method."""
+
+    # rescale to non-dimensional variables
+    alpha, beta, k = heat_parameters(r, sigma)
+    Nminus = math.log(1/E)
+    Nplus = math.log(S_max/E)
+    x_values = heat_grid(Nminus, Nplus, x_mesh, E, cluster, cluster_width)
+    timestep_count = max(1, round(final_time / dt))
+    dt = final_time / timestep_count
+    stencil = tuple(dt * c for c in second_difference(x_values))
+
+    tau_values, rannacher_steps = time_levels(final_time, dt, theta, rannacher_steps)
+    strike_ratios = 1.0 if strikes is None else np.asarray(strikes, dtype=float) / E
+    columns_given = np.ndim(option_type) > 0 or np.ndim(strike_ratios) > 0
+    u, lower, upper = heat_columns(Nminus, Nplus, x_values, tau_values, alpha, beta, k, option_type, strike_ratios)
+    recorder = None if record is None else SliceRecorder(tau_values, record_taus(tau_values, record), u.shape)
+    obstacle = exercise_index = None
+    if american:
+        option_types = np.broadcast_arrays(np.asarray(option_type), np.asarray(strike_ratios))[0].ravel()
+        if np.any(option_types == "straddle"):
+            raise ValueError("American straddles are exercised on both sides, which a Brennan-Schwartz solve does not handle")
+        # the exercise value of u is the payoff column scaled to each time level
+        payoff = np.where(option_types == "put", u, -np.inf)
+        obstacle = lambda level: payoff * math.exp(-beta * tau_values[level])
+        lower = np.maximum(lower, payoff[0] * np.exp(-beta * tau_values)[:, None])
+        exercise_index = np.empty((len(tau_values), u.shape[1]), dtype=int)
+    u = theta_march(u, lower, upper, stencil, theta, rannacher_steps, recorder, obstacle, exercise_index)
+    if recorder is not None:
+        solution = (PDESolution(x_values, recorder.taus, recorder.history, E, alpha, beta, sigma, columns_given, method),)
+    else:
+        # convert back to dimensional variables
+        S_values, V_values = to_dimensional(x_values[:, None], u, final_time, E, alpha, beta)
+        solution = (S_values[:, 0], V_values if columns_given else V_values[:, 0])
+
+    if american:
+        # the boundary at the full timesteps, the Rannacher half steps left out
+        full_levels = np.flatnonzero(np.isclose(tau_values / dt, np.round(tau_values / dt)))
+        boundary = E * np.exp(x_values[exercise_index[full_levels]])
+        boundary[:, option_types != "put"] = np.nan
+        solution += (boundary if columns_given else boundary[:, 0],)
+    if return_greeks and recorder is None:
+        exercised = None
+        if american:
+            exercised = (np.arange(len(x_values))[:, None] <= exercise_index[-1]) & (option_types == "put")
+        greeks = grid_greeks(x_values, u, final_time, E, alpha, beta, sigma, exercised)
+        solution += (greeks if columns_given else tuple(g[:, 0] for g in greeks),)
+    return solution[0] if len(solution) == 1 else solution
+
+def backward_euler(r, sigma, E, S_min, S_max, option_type="call", x_mesh=1000, final_time=0.025, dt=0.001,
+                   record=None, method="cubic", cluster=None, cluster_width=0.1, american=False,
+                   return_greeks=False):
     """Convert Black Scholes to non-dimensional heat equation,
     and solve using backward Euler, following Wilmott."""
+    return crank_nicolson(r, sigma, E, S_min, S_max, option_type, x_mesh=x_mesh, final_time=final_time,
+                          dt=dt, theta=1.0, rannacher_steps=0, record=record, method=method,
+                          cluster=cluster, cluster_width=cluster_width, american=american,
+                          return_greeks=return_greeks)
+
+def crank_nicolson_to_tolerance(r, sigma, E, S_max, S, tol, option_type="call", final_time=0.025, x_mesh=100,
+                                dt=0.004, theta=0.5, american=False, cluster=None, max_refinements=6) -> ResolutionResult:
+    """Values at the asset prices S from the coarsest grid, starting at (x_mesh, dt) and
+    halving both spacings each refinement, whose Richardson error estimate is within tol.
+    Crank-Nicolson is second order in both, backward Euler and early exercise are
+    estimated as first order. Returns a ResolutionResult with resolution (x_mesh, dt)."""
+    order = 2 if theta == 0.5 and not american else 1
+
+    def values_at(resolution):
+        x_mesh, dt = resolution
+        S_values, V_values = crank_nicolson(r, sigma, E, 0, S_max, option_type, x_mesh=x_mesh, final_time=final_time,
+                                            dt=dt, theta=theta, cluster=cluster, american=american)[:2]
+        return np.interp(S, S_values, V_values)
+
+    resolutions = [((x_mesh * 2 ** i, dt / 2 ** i), 2 ** i) for i in range(max_refinements + 1)]
+    return refine_to_tolerance(values_at, resolutions, tol, order)
+
+def batched_tridiagonal_factor(lower, diagonal, upper) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Thomas algorithm elimination for a batch of tridiagonal systems, one system per row
+    of the (batch x n) arrays; lower[:, 0] and upper[:, -1] are not used. The loop runs
+    over the n nodes, each step vectorized across the batch. Returns the factorization
+    for batched_tridiagonal_solve, stored node major so every step reads contiguous rows."""
+    lower, diagonal, upper = (np.ascontiguousarray(np.transpose(a)) for a in np.broadcast_arrays(lower, diagonal, upper))
+    inverse_pivots = np.empty_like(diagonal)
+    ratios = np.empty_like(diagonal)
+    inverse_pivots[0] = 1 / diagonal[0]
+    ratios[0] = upper[0] * inverse_pivots[0]
+    for i in range(1, len(diagonal)):
+        inverse_pivots[i] = 1 / (diagonal[i] - lower[i] * ratios[i - 1])
+        ratios[i] = upper[i] * inverse_pivots[i]
+    return lower * inverse_pivots, inverse_pivots, ratios
+
+def batched_tridiagonal_solve(factorization, rhs) -> np.ndarray:
+    """Solve the factorized batch of systems for the right hand sides rhs (batch x n),
+    by forward elimination and back substitution vectorized across the batch."""
+    scaled_lower, inverse_pivots, ratios = factorization
+    y = np.multiply(np.transpose(rhs), inverse_pivots, order="C")
+    product = np.empty(y.shape[1:])
+    for i in range(1, len(y)):
+        np.multiply(scaled_lower[i], y[i - 1], out=product)
+        y[i] -= product
+    for i in range(len(y) - 2, -1, -1):
+        np.multiply(ratios[i], y[i + 1], out=product)
+        y[i] -= product
+    return y.T
+
+def batched_theta_scheme(r, sigma, E, S_max, time_to_expiry, option_type="call", x_mesh=1000, timestep_count=None,
+                         theta=0.5, rannacher_steps=2, cluster=None, cluster_width=0.1):
+    """Black Scholes values for a whole sweep of (r, sigma), solved as one batch of heat
+    equations, following Wilmott. r and sigma broadcast together; every pair has its own
+    change of variables and dimensionless time sigma^2 (T - t) / 2, so its own timestep, but
+    all share the grid in x = log(S/E) and the number of timesteps.
+    theta = 0 is the explicit scheme, with no solve and no Rannacher steps, theta = 1 backward
+    Euler and 1/2 Crank-Nicolson, whose first rannacher_steps steps are two backward Euler half steps each.
+    By default timestep_count is the smallest stable one for theta = 0 and gives steps of
+    about 0.001 in tau otherwise. Returns S and V, V of shape (sweep shape x nodes)."""
+    r, sigma = np.broadcast_arrays(np.asarray(r, dtype=float), np.asarray(sigma, dtype=float))
+    shape = r.shape
+    r, sigma = r.reshape(-1, 1), sigma.reshape(-1, 1)
+    alpha, beta, k = heat_parameters(r, sigma)
+    final_time = 0.5 * sigma * sigma * time_to_expiry
 
-    # rescale to non-dimensional variables
-    alpha = -1/2 * (2 * r / (sigma * sigma) - 1)
-    beta = -1/4 * (2 * r / (sigma * sigma) + 1) * (2 * r / (sigma * sigma) + 1)
     Nminus = math.log(1/E)
     Nplus = math.log(S_max/E)
-    x_mesh = 1000
-    dx = (Nplus - Nminus)/x_mesh
-    dt = 0.001
-    timestep_alpha = dt / (dx * dx)
-
-    # x domain
-    x_values = [Nminus + dx * i for i in range(x_mesh +1)]
-
-    # initial condition
-    u0 = [ max(0, math.exp(-alpha * x_values[i]) * (math.exp(x_values[i]) - 1)) for i in range(x_mesh +1)]
-
-    # set up y for LU decomposition
-    y = [None for i in range(x_mesh + 1)]
-    lu_find_y(y, timestep_alpha)
-
-    # solve implicitly heat equation
-    tau = 0
-    u = u0
-    final_time = 0.025
-    timestep_count = int(final_time/dt)
-    for timestep in range(timestep_count):
-        b = u.copy()
-        u_m_inf = 0
-        tau = final_time / timestep_count * timestep
-        u_p_inf = math.exp(-alpha * Nplus) * math.exp(-beta * tau) * (math.exp(Nplus) - math.exp(-2*r/sigma/sigma*tau))
-        b[0] += timestep_alpha * u_m_inf
-        b[-1] += timestep_alpha * u_p_inf
-        lu_solver(u, b, y, timestep_alpha, Nminus, Nplus)
+    x_values = heat_grid(Nminus, Nplus, x_mesh, E, cluster, cluster_width)
+    l, m, right = second_difference(x_values)
+    stable_count = math.ceil(final_time.max() * np.max(-m))
+    if timestep_count is None:
+        timestep_count = max(1, stable_count if theta == 0 else math.ceil(final_time.max() / 0.001))
+    elif theta == 0 and timestep_count < stable_count:
+        raise ValueError(f"The explicit scheme needs at least {stable_count} timesteps to be stable")
+    dt = final_time / timestep_count
+
+    # the explicit scheme takes no implicit half steps, its stability check assumes full ones
+    if theta == 0:
+        rannacher_steps = 0
+    # the time levels of every batch member are one set of fractions of its final time
+    fractions, rannacher_steps = time_levels(1.0, 1.0 / timestep_count, theta, rannacher_steps)
+    tau_values = final_time * fractions  # (batch x levels)
+    u = heat_payoff(x_values, alpha, option_type)  # (batch x nodes)
+    lower, upper = heat_boundaries(Nminus, Nplus, tau_values, alpha, beta, k, option_type)
+
+    def operators(step, step_theta):
+        # the stencil times each batch member's timestep, and I - theta A factorized
+        stencil = (step * l, step * m, step * right)
+        if step_theta == 0:
+            return stencil, None
+        return stencil, batched_tridiagonal_factor(-step_theta * stencil[0], 1 - step_theta * stencil[1], -step_theta * stencil[2])
+
+    full = operators(dt, theta)
+    half = operators(dt / 2, 1.0) if rannacher_steps else None
+    u_new = np.empty_like(u)
+    for level in range(1, len(fractions)):
+        (sl, sm, sr), factorization = half if level <= 2 * rannacher_steps else full
+        step_theta = 1.0 if level <= 2 * rannacher_steps else theta
+        rhs = sl * u[:, :-2]
+        rhs += sm * u[:, 1:-1]
+        rhs += sr * u[:, 2:]
+        rhs *= 1 - step_theta
+        rhs += u[:, 1:-1]
+        if factorization is None:
+            u_new[:, 1:-1] = rhs
+        else:
+            rhs[:, 0] += step_theta * sl[:, 0] * lower[:, level]
+            rhs[:, -1] += step_theta * sr[:, -1] * upper[:, level]
+            u_new[:, 1:-1] = batched_tridiagonal_solve(factorization, rhs)
+        u_new[:, 0] = lower[:, level]
+        u_new[:, -1] = upper[:, level]
+        u, u_new = u_new, u
 
     # convert back to dimensional variables
-    return_S = [E * math.exp(x_values[i]) for i in range(x_mesh +1)]
-    return_V = [E * math.exp(alpha * x_values[i]) * u[i] * math.exp(beta * tau) for i in range(x_mesh +1)]
-    return return_S, return_V
+    S_values, V_values = to_dimensional(x_values, u, final_time, E, alpha, beta)
+    return S_values, V_values.reshape(shape + (len(x_values),))
 
 if __name__ == '__main__':
     """An example of a backward Euler calculation."""
@@ -84,6 +339,10 @@ if __name__ == '__main__':
     implicit_S, implicit_V = backward_euler(r, sigma, E, 0, 100)
     plt.plot(implicit_S, implicit_V)
 
+    # calls at three strikes on one Crank-Nicolson grid
+    cn_S, cn_V = crank_nicolson(r, sigma, E, 0, 100, "call", strikes=[45, 50, 55])
+    plt.plot(cn_S, cn_V)
+
     # plot
-    plt.legend(["Backward Euler t=50=T", "Backward Euler t=45"])
+    plt.legend(["Backward Euler t=50=T", "Backward Euler t=45"] + ["Crank-Nicolson t=45 E=" + str(K) for K in [45, 50, 55]])
     plt.show()
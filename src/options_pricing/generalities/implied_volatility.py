@@ -0,0 +1,155 @@
+import numpy as np
+from scipy.special import ndtr
+
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+def _initial_guess(call_price, S_discounted, E_discounted, tau):
+    """Corrado-Miller rational approximation to the implied volatility of a call, with a
+    negative discriminant floored at zero. The at the money Brenner-Subrahmanyam formula
+    is not used as a fallback, away from the money it scales the whole call price."""
+    moneyness = S_discounted - E_discounted
+    excess = call_price - 0.5 * moneyness
+    discriminant = excess * excess - moneyness * moneyness / np.pi
+    return (
+        SQRT_2PI / np.sqrt(tau) / (S_discounted + E_discounted)
+        * (excess + np.sqrt(np.maximum(discriminant, 0)))
+    )
+
+def _inflection_bracket(target, S_discounted, E_discounted, log_moneyness, tau, sigma_max, tol):
+    """Bracket [lo, hi] of the implied volatility from one value at the Manaster-Koehler
+    point sqrt(2 |log(S/E)| / tau), the inflection of the value in sigma. There d1 d2 = 0,
+    so the out of the money value has a closed form, and the root lies on the side of it
+    where the value is below or above target. The bracket reaches tol past the inflection
+    point, so a root right on it is not pushed out by rounding.
+    Returns (lo, hi, wing), wing masking the roots below the inflection point."""
+    inflection = np.minimum(np.sqrt(2.0 * np.abs(log_moneyness) / tau), sigma_max)
+    root_distance = np.sqrt(2.0 * np.abs(log_moneyness))
+    # time value of the call at the inflection point, with d1 = root_distance, d2 = 0
+    # in the money and d1 = 0, d2 = -root_distance out of it
+    value = np.where(
+        log_moneyness > 0,
+        E_discounted * 0.5 - S_discounted * ndtr(-root_distance),
+        S_discounted * 0.5 - E_discounted * ndtr(-root_distance),
+    )
+    wing = value > target
+    lo = np.where(wing, 0.0, np.maximum(inflection - tol, 0.0))
+    hi = np.where(wing, inflection + tol, sigma_max)
+    return lo, hi, wing
+
+def implied_volatility(price, S, D, t, T, E, r, option_type="call", tol=1e-8, max_iter=100, sigma_max=10.0):
+    """Invert the closed form Black Scholes value for sigma, for a whole chain at once.
+    All arguments broadcast against each other, option_type is "call" or "put".
+    Uses a Halley iteration from a rational initial guess, safeguarded by a per-element
+    bracket [lo, hi], started on the side of the Manaster-Koehler inflection point that
+    holds the root, that falls back to bisection whenever a step would leave it.
+    Returns (sigma, solved) arrays; sigma is NaN where no volatility in (0, sigma_max)
+    reproduces the price, e.g. a price below intrinsic value, above the asset price or
+    above the value at sigma_max."""
+    price, S, D, t, T, E, r = (np.asarray(a, dtype=float) for a in (price, S, D, t, T, E, r))
+    tau = T - t
+    S_discounted = S * np.exp(-D * tau)
+    E_discounted = E * np.exp(-r * tau)
+    shape = np.broadcast_shapes(price.shape, tau.shape, S_discounted.shape, E_discounted.shape)
+    price, tau, S_discounted, E_discounted = (
+        np.broadcast_to(a, shape).ravel() for a in (price, tau, S_discounted, E_discounted)
+    )
+
+    # work with call prices throughout, puts are converted by put-call parity
+    if option_type == "call":
+        call_price = price
+    elif option_type == "put":
+        call_price = price + S_discounted - E_discounted
+    else:
+        raise ValueError(f"Unknown option type {option_type}")
+
+    # no-arbitrage bounds, outside them there is no solution, and above the value at
+    # sigma_max there is none in (0, sigma_max)
+    lower_bound = np.maximum(S_discounted - E_discounted, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        max_sqrt_tau = sigma_max * np.sqrt(np.maximum(tau, 0))
+        d1 = np.log(S_discounted / E_discounted) / max_sqrt_tau + 0.5 * max_sqrt_tau
+        upper_bound = S_discounted * ndtr(d1) - E_discounted * ndtr(d1 - max_sqrt_tau)
+    solvable = (tau > 0) & (call_price > lower_bound) & (call_price < np.minimum(upper_bound, S_discounted))
+
+    sigma = np.full(price.shape, np.nan)
+    solved = np.zeros(price.shape, dtype=bool)
+
+    # only iterate on the elements that have not converged yet
+    idx = np.flatnonzero(solvable)
+    Sd = S_discounted[idx]
+    Ed = E_discounted[idx]
+    sqrt_tau = np.sqrt(tau[idx])
+    log_moneyness = np.log(Sd / Ed)
+    # iterate on the out of the money option, whose value is the time value of the call
+    otm_sign = np.where(Sd > Ed, -1.0, 1.0)
+    target = call_price[idx] - lower_bound[idx]
+    vega_scale = Sd * sqrt_tau / SQRT_2PI
+    # the rational guess is usually close; where it falls on the wrong side of the inflection
+    # point it is clamped onto it, from where the Halley steps head straight for the root
+    lo, hi, wing = _inflection_bracket(target, Sd, Ed, log_moneyness, tau[idx], sigma_max, tol)
+    s = np.clip(_initial_guess(call_price[idx], Sd, Ed, tau[idx]), np.maximum(lo, 1e-4), np.minimum(hi, sigma_max - 1e-4))
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            if idx.size == 0:
+                break
+            sigma_sqrt_tau = s * sqrt_tau
+            d1 = log_moneyness / sigma_sqrt_tau + 0.5 * sigma_sqrt_tau
+            d2 = d1 - sigma_sqrt_tau
+            value = otm_sign * (Sd * ndtr(otm_sign * d1) - Ed * ndtr(otm_sign * d2))
+            vega = vega_scale * np.exp(-0.5 * d1 * d1)
+
+            # the value is increasing in sigma, so the sign of the error tightens the bracket
+            too_high = value > target
+            hi[too_high] = s[too_high]
+            too_low = ~too_high
+            lo[too_low] = s[too_low]
+
+            # above the root a Newton step on the value itself is the more conservative one,
+            # below it the step on the log of the value is, which is far better conditioned
+            # in the wings; the Halley correction uses f'' / f' = vomma / vega = d1 d2 / sigma
+            # for the value and an extra - vega / value for its log
+            newton_step = value - target
+            curvature = d1 * d2 / s
+            on_log = too_low | wing
+            newton_step[on_log] = np.log(value[on_log] / target[on_log]) * value[on_log]
+            curvature[on_log] -= vega[on_log] / value[on_log]
+            newton_step /= vega
+            # below the inflection point the log of the value is close to linear in
+            # w = 1 / sigma^2, so the step is taken in w there, with dw / dsigma = -2 / sigma^3
+            s_wing = s[wing]
+            newton_step[wing] *= -2.0 / s_wing ** 3
+            curvature[wing] = -0.5 * s_wing ** 3 * curvature[wing] - 1.5 * s_wing * s_wing
+            halley_denominator = 1.0 - 0.5 * newton_step * curvature
+            use_halley = (halley_denominator > 0.5) & (halley_denominator < 2.0)
+            newton_step[use_halley] /= halley_denominator[use_halley]
+            s_new = s - newton_step
+            s_new[wing] = 1.0 / np.sqrt(s_wing ** -2 - newton_step[wing])
+
+            # fall back to bisection whenever the step leaves the bracket
+            bisect = ~((s_new >= lo) & (s_new <= hi))
+            s_new[bisect] = 0.5 * (lo[bisect] + hi[bisect])
+
+            done = (np.abs(s_new - s) < tol) | (hi - lo < tol)
+            if done.any():
+                sigma[idx[done]] = s_new[done]
+                solved[idx[done]] = True
+                keep = ~done
+                idx, Sd, Ed, sqrt_tau, log_moneyness, otm_sign, target, vega_scale, lo, hi, s_new, wing = (
+                    a[keep] for a in (idx, Sd, Ed, sqrt_tau, log_moneyness, otm_sign, target, vega_scale, lo, hi, s_new, wing)
+                )
+            s = s_new
+
+    return sigma.reshape(shape), solved.reshape(shape)
+
+if __name__ == '__main__':
+    """Recover the volatility used to generate a strip of call and put prices."""
+    from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_call_put
+
+    strikes = np.linspace(100, 400, 75)
+    true_sigma = 0.4 + 0.3 * ((strikes - 236.26) / 236.26) ** 2
+    calls, puts = black_scholes_call_put(236.26, 0, 0, 36 / 360, strikes, true_sigma, 0.0439)
+    call_sigma, call_solved = implied_volatility(calls, 236.26, 0, 0, 36 / 360, strikes, 0.0439, "call")
+    put_sigma, put_solved = implied_volatility(puts, 236.26, 0, 0, 36 / 360, strikes, 0.0439, "put")
+    print("max call error", np.nanmax(np.abs(call_sigma - true_sigma)), "solved", call_solved.sum())
+    print("max put error", np.nanmax(np.abs(put_sigma - true_sigma)), "solved", put_solved.sum())
@@ -0,0 +1,138 @@
+import math
+import numpy as np
+from scipy.special import ndtri
+from typing import NamedTuple
+from src.options_pricing.generalities.random_streams import resolve_rng
+
+class MonteCarloEstimate(NamedTuple):
+    """Estimate of an expectation, its standard error and the number of integrand
+    evaluations it took."""
+    value: float
+    standard_error: float
+    samples: int
+
+class MonteCarloEstimator:
+    """Monte Carlo estimate of E[integrand(Z)] for Z a vector of dimension independent
+    standard normals, the integrand taking an (n x dimension) array and returning n values.
+    Variance reduction, any combination of:
+    antithetic, each draw Z is paired with -Z (about the shift, if any);
+    control, a function of Z like the integrand whose mean control_mean is known exactly,
+    subtracted with the regression coefficient estimated from the same draws;
+    strata, the first coordinate is drawn equally from that many equal-probability strata;
+    shift, importance sampling from N(shift, I), every value weighted by the likelihood
+    ratio exp(-shift.Z + shift.shift / 2).
+    rng is a Generator, a RandomStream or a seed.
+    Running statistics are kept per stratum, so estimate and run_to_error can be called
+    repeatedly and keep adding to the same estimate."""
+
+    def __init__(self, integrand, dimension=1, antithetic=False, control=None, control_mean=0.0, strata=1,
+                 shift=None, rng=None):
+        self.integrand = integrand
+        self.dimension = dimension
+        self.antithetic = antithetic
+        self.control = control
+        self.control_mean = control_mean
+        self.strata = strata
+        self.shift = None if shift is None else np.broadcast_to(np.asarray(shift, dtype=float), (dimension,))
+        self.rng = resolve_rng(rng)
+        self.samples = 0
+        # per stratum: count and the sums of y, c, y^2, c^2 and y c
+        self._sums = np.zeros((6, strata))
+
+    def reset(self) -> None:
+        self.samples = 0
+        self._sums[:] = 0
+
+    def _normals(self, n_per_stratum) -> (np.ndarray, np.ndarray):
+        """Standard normals, n_per_stratum for each stratum of the first coordinate, and
+        the stratum of each row."""
+        z = self.rng.standard_normal((n_per_stratum * self.strata, self.dimension))
+        stratum = np.repeat(np.arange(self.strata), n_per_stratum)
+        if self.strata > 1:
+            z[:, 0] = ndtri((stratum + self.rng.random(len(stratum))) / self.strata)
+        return z, stratum
+
+    def _observe(self, z) -> (np.ndarray, np.ndarray):
+        """Integrand and control values at the draws z, weighted back to N(0, I)."""
+        if self.shift is not None:
+            weight = np.exp(-z @ self.shift - 0.5 * self.shift @ self.shift)
+            z = z + self.shift
+        else:
+            weight = 1.0
+        y = weight * self.integrand(z)
+        c = weight * self.control(z) if self.control is not None else np.zeros_like(y)
+        return y, c
+
+    def add_samples(self, n) -> None:
+        """Draw about n more integrand values, rounded up to fill the strata and pairs."""
+        pairs = 2 if self.antithetic else 1
+        n_per_stratum = max(2, math.ceil(n / (pairs * self.strata)))
+        z, stratum = self._normals(n_per_stratum)
+        y, c = self._observe(z)
+        if self.antithetic:
+            y_reflected, c_reflected = self._observe(-z)
+            y = 0.5 * (y + y_reflected)
+            c = 0.5 * (c + c_reflected)
+        self.samples += pairs * len(z)
+
+        for row, values in enumerate([np.ones_like(y), y, c, y * y, c * c, y * c]):
+            self._sums[row] += np.bincount(stratum, weights=values, minlength=self.strata)
+
+    def result(self) -> MonteCarloEstimate:
+        """Estimate and standard error from all the samples drawn so far."""
+        count, sum_y, sum_c, sum_yy, sum_cc, sum_yc = self._sums
+        mean_y = sum_y / count
+        mean_c = sum_c / count
+        # centred sums within each stratum
+        s_yy = sum_yy - count * mean_y * mean_y
+        s_cc = sum_cc - count * mean_c * mean_c
+        s_yc = sum_yc - count * mean_y * mean_c
+
+        beta = s_yc.sum() / s_cc.sum() if self.control is not None and s_cc.sum() > 0 else 0.0
+        value = mean_y.mean() - beta * (mean_c.mean() - self.control_mean)
+        variance = np.maximum(s_yy - 2 * beta * s_yc + beta * beta * s_cc, 0) / (count - 1)
+        standard_error = math.sqrt(np.sum(variance / count)) / self.strata
+        return MonteCarloEstimate(float(value), standard_error, self.samples)
+
+    def estimate(self, n) -> MonteCarloEstimate:
+        self.add_samples(n)
+        return self.result()
+
+    def run_to_error(self, target_error, batch_size=10000, max_samples=10**8) -> MonteCarloEstimate:
+        """Add batches of samples until the standard error is at most target_error, each
+        batch sized from the current error, since the error falls like 1/sqrt(samples).
+        Raises ValueError if max_samples is reached first."""
+        if self.samples == 0:
+            self.add_samples(batch_size)
+        estimate = self.result()
+        while estimate.standard_error > target_error:
+            if estimate.samples >= max_samples:
+                raise ValueError(f"Standard error {estimate.standard_error} above {target_error} after {estimate.samples} samples")
+            needed = estimate.samples * ((estimate.standard_error / target_error) ** 2 - 1)
+            self.add_samples(min(max(needed * 1.1, batch_size), max_samples - estimate.samples))
+            estimate = self.result()
+        return estimate
+
+def lognormal_mean(mu, sigma) -> float:
+    """E[exp(X)] for X normal with mean mu and standard deviation sigma."""
+    return math.exp(mu + 0.5 * sigma * sigma)
+
+if __name__ == '__main__':
+    """Discounted payoff of a call under Black-Scholes, plain and with the terminal asset
+    price, whose mean is known, as the control."""
+    from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+    S, E, r, sigma, T = 100, 110, 0.05, 0.2, 1.0
+
+    def asset(z):
+        return S * np.exp((r - 0.5 * sigma * sigma) * T + sigma * math.sqrt(T) * z[:, 0])
+
+    def payoff(z):
+        return math.exp(-r * T) * np.maximum(asset(z) - E, 0)
+
+    print("closed form", black_scholes_value(S, 0, 0, T, E, sigma, r))
+    for name, options in [("plain", {}), ("antithetic", {"antithetic": True}),
+                          ("control", {"control": asset, "control_mean": S * math.exp(r * T)}),
+                          ("stratified", {"strata": 100}), ("all", {"antithetic": True, "control": asset,
+                                                                    "control_mean": S * math.exp(r * T), "strata": 100})]:
+        estimate = MonteCarloEstimator(payoff, **options).run_to_error(0.01)
+        print(name, estimate)
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import zipfile
+import numpy as np
+from datetime import datetime
+
+def _default_file_mode() -> int:
+    """Mode open() gives a new file under the current umask, which can only be read by
+    setting it."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+class OptionsChain:
+    """One options chain snapshot, every column of the tab separated chain file
+    held as a typed ndarray and sorted numerically by strike.
+
+    Columns: contract (str), timestamp (datetime64[m]), strike, last, bid, ask, change,
+    percent_change, volume, open_interest and implied_volatility (float). Percentages are
+    stored as fractions, and missing fields ("-") as NaN."""
+
+    columns = (
+        "contract", "timestamp", "strike", "last", "bid", "ask", "change",
+        "percent_change", "volume", "open_interest", "implied_volatility",
+    )
+    percent_columns = ("percent_change", "implied_volatility")
+    cache_suffix = ".npz"
+
+    def __init__(self, **columns):
+        for name in self.columns:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.strike)
+
+    @classmethod
+    def load(cls, path, use_cache: bool = True) -> "OptionsChain":
+        """Load a chain file, from its binary sidecar cache when the cache was written
+        for a source file with the same modification time and size. A cache that cannot
+        be read, e.g. a truncated or corrupt file, counts as a miss and is rewritten."""
+        path = os.fspath(path)
+        source = os.stat(path)
+        cache_path = path + cls.cache_suffix
+        if use_cache and os.path.exists(cache_path):
+            chain = cls._read_cache(cache_path, source)
+            if chain is not None:
+                return chain
+
+        chain = cls.parse(path)
+        if use_cache:
+            chain.save_cache(cache_path, source.st_mtime_ns, source.st_size)
+        return chain
+
+    @classmethod
+    def _read_cache(cls, cache_path, source):
+        """The chain in cache_path if it was written for the source stat, otherwise None."""
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if (
+                    int(cached["source_mtime_ns"]) == source.st_mtime_ns
+                    and int(cached["source_size"]) == source.st_size
+                ):
+                    return cls(**{name: cached[name] for name in cls.columns})
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # unreadable, truncated or not a cache of ours, the source file is the truth
+            pass
+        return None
+
+    @classmethod
+    def parse(cls, path) -> "OptionsChain":
+        """Parse a chain file column by column, without using any cache."""
+        with open(path, "r") as f:
+            rows = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+        if any(len(row) != len(cls.columns) for row in rows):
+            raise ValueError(f"Expected {len(cls.columns)} tab separated fields per line in {path}")
+        raw = dict(zip(cls.columns, (np.array(column) for column in zip(*rows))))
+
+        parsed = {"contract": raw["contract"]}
+        # timestamps repeat a lot within a snapshot, so only parse the distinct ones
+        distinct, inverse = np.unique(raw["timestamp"], return_inverse=True)
+        parsed["timestamp"] = np.array(
+            [np.datetime64(datetime.strptime(s, "%m/%d/%Y %I:%M %p"), "m") for s in distinct],
+            dtype="datetime64[m]",
+        )[inverse]
+        for name in cls.columns[2:]:
+            column = np.char.replace(np.char.replace(raw[name], ",", ""), "%", "")
+            column = np.where(column == "-", "nan", column).astype(float)
+            if name in cls.percent_columns:
+                column /= 100.0
+            parsed[name] = column
+
+        order = np.argsort(parsed["strike"], kind="stable")
+        return cls(**{name: parsed[name][order] for name in cls.columns})
+
+    def save_cache(self, cache_path, source_mtime_ns: int, source_size: int) -> None:
+        """Write the columns to a binary sidecar file, tagged with the source file's stat.
+        A cache that cannot be written, e.g. in a read-only directory, is skipped."""
+        temp_path = None
+        try:
+            # a unique temporary name, so concurrent writers never share a half written file
+            fd, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(cache_path) or ".", prefix=os.path.basename(cache_path), suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    source_mtime_ns=np.int64(source_mtime_ns),
+                    source_size=np.int64(source_size),
+                    **{name: getattr(self, name) for name in self.columns},
+                )
+            # mkstemp creates the file 0600, give the cache the mode of the files next to it
+            os.chmod(temp_path, _default_file_mode())
+            os.replace(temp_path, cache_path)
+        except OSError:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+if __name__ == '__main__':
+    """Load a chain and print the first few strikes."""
+    from importlib import resources
+    chain = OptionsChain.load(resources.files("options_chains") / "tsla_call_20250320_20250425")
+    for i in range(5):
+        print(chain.contract[i], chain.timestamp[i], chain.strike[i], chain.last[i], chain.volume[i], chain.implied_volatility[i])
@@ -0,0 +1,89 @@
+import math
+import numpy as np
+from collections import OrderedDict
+from src.options_pricing.generalities.heat_equation import SliceRecorder, heat_columns, heat_parameters, second_difference
+from src.options_pricing.generalities.implicit import theta_march, time_levels
+
+class PDESolutionCache:
+    """Solutions u(x, tau) of the dimensionless heat equation, following Wilmott, kept for
+    reuse across strikes. With E = 1 the grid in x = log(S/E) and the payoff no longer depend
+    on the strike, so one solve on [x_min, x_max] for a given (r, sigma, option type, tau grid)
+    prices any strike: V = E e^(alpha x + beta tau) u(x, tau), with u interpolated bilinearly
+    between the grid nodes and the recorded time levels. Holds at most maxsize solutions,
+    evicting the least recently used."""
+
+    def __init__(self, maxsize=32, x_min=-3.0, x_max=3.0, x_mesh=1000, dt=0.001, theta=0.5, rannacher_steps=2):
+        self.maxsize = maxsize
+        self.x_values = np.linspace(x_min, x_max, x_mesh + 1)
+        self.dt = dt
+        self.theta = theta
+        self.rannacher_steps = rannacher_steps
+        self.hits = 0
+        self.misses = 0
+        self._solutions = OrderedDict()
+
+    def __len__(self):
+        return len(self._solutions)
+
+    def clear(self) -> None:
+        self._solutions.clear()
+
+    def solution(self, r, sigma, option_type, final_time) -> (np.ndarray, np.ndarray):
+        """The time levels and u at each of them (levels x nodes) for a march to at least
+        final_time. Any cached solution for the same r, sigma and option type that reaches
+        final_time is reused, otherwise one is solved to final_time rounded up to whole steps."""
+        timestep_count = max(1, math.ceil(final_time / self.dt - 1e-9))
+        for key in reversed(self._solutions):
+            if key[:3] == (float(r), float(sigma), option_type) and key[3] >= timestep_count:
+                self.hits += 1
+                self._solutions.move_to_end(key)
+                return self._solutions[key]
+        key = (float(r), float(sigma), option_type, timestep_count)
+
+        self.misses += 1
+        alpha, beta, k = heat_parameters(r, sigma)
+        x = self.x_values
+        tau_values, rannacher_steps = time_levels(timestep_count * self.dt, self.dt, self.theta, self.rannacher_steps)
+        u0, lower, upper = heat_columns(x[0], x[-1], x, tau_values, alpha, beta, k, option_type, 1.0)
+        recorder = SliceRecorder(tau_values, tau_values, u0.shape)
+        stencil = tuple(self.dt * c for c in second_difference(x))
+        theta_march(u0, lower, upper, stencil, self.theta, rannacher_steps, recorder)
+
+        self._solutions[key] = (tau_values, recorder.history[:, :, 0])
+        if len(self._solutions) > self.maxsize:
+            self._solutions.popitem(last=False)
+        return self._solutions[key]
+
+    def value(self, S, E, t, T, r, sigma, option_type="call") -> np.ndarray:
+        """Value of European options at asset prices S, strikes E, times t and expiries T,
+        all broadcast together, from a single cached solve for the given r and sigma."""
+        S, E, t, T = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, E, t, T)))
+        x = np.log(S / E)
+        tau = 0.5 * sigma * sigma * (T - t)
+        if np.any(tau < 0):
+            raise ValueError("Times t must not be after expiry T")
+        if np.any((x < self.x_values[0]) | (x > self.x_values[-1])):
+            raise ValueError(f"log(S/E) outside the cached grid [{self.x_values[0]}, {self.x_values[-1]}]")
+        tau_values, u = self.solution(r, sigma, option_type, tau.max(initial=0.0))
+
+        # bilinear interpolation, the x grid is uniform and the time levels are not
+        dx = self.x_values[1] - self.x_values[0]
+        i = np.clip(((x - self.x_values[0]) // dx).astype(int), 0, len(self.x_values) - 2)
+        x_weight = (x - self.x_values[i]) / dx
+        n = np.clip(np.searchsorted(tau_values, tau, side="right") - 1, 0, len(tau_values) - 2)
+        tau_weight = (tau - tau_values[n]) / (tau_values[n + 1] - tau_values[n])
+        u_interpolated = (
+            (1 - tau_weight) * ((1 - x_weight) * u[n, i] + x_weight * u[n, i + 1])
+            + tau_weight * ((1 - x_weight) * u[n + 1, i] + x_weight * u[n + 1, i + 1])
+        )
+        alpha, beta, _ = heat_parameters(r, sigma)
+        return E * np.exp(alpha * x + beta * tau) * u_interpolated
+
+if __name__ == '__main__':
+    """Price a chain of 75 calls from one cached solve."""
+    from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+    cache = PDESolutionCache()
+    strikes = np.linspace(100, 400, 75)
+    values = cache.value(236.26, strikes, 0, 36 / 360, 0.0439, 0.6)
+    exact = black_scholes_value(236.26, 0, 0, 36 / 360, strikes, 0.6, 0.0439)
+    print("max error", np.abs(values - exact).max(), "solves", cache.misses)
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+from src.options_pricing.generalities.monte_carlo import MonteCarloEstimate
+from src.options_pricing.generalities.random_streams import as_generator, resolve_rng
+
+def sobol_normals(n, dimension, rng=None) -> np.ndarray:
+    """(n x dimension) standard normals from a scrambled Sobol sequence by the inverse
+    normal CDF. Scrambling keeps every point inside the unit cube, and a fresh scramble
+    from rng gives an independent randomised QMC replicate. n a power of two keeps the
+    balance properties of the sequence."""
+    sampler = qmc.Sobol(dimension, scramble=True, seed=as_generator(rng))
+    return ndtri(sampler.random(n))
+
+def bridge_schedule(n_steps) -> list:
+    """Order in which Brownian bridge construction fills W(1), ..., W(n_steps) on a unit
+    step grid: the end point, then the midpoints of ever smaller intervals. Each entry is
+    (index, left, right, left weight, right weight, standard deviation), with left = 0
+    standing for W(0) = 0."""
+    schedule = [(n_steps, 0, 0, 0.0, 0.0, math.sqrt(n_steps))]
+    intervals = [(0, n_steps)]
+    while intervals:
+        next_intervals = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            middle = (left + right) // 2
+            schedule.append((middle, left, right, (right - middle) / (right - left), (middle - left) / (right - left),
+                             math.sqrt((middle - left) * (right - middle) / (right - left))))
+            next_intervals += [(left, middle), (middle, right)]
+        intervals = next_intervals
+    return schedule
+
+def brownian_bridge_normals(z) -> np.ndarray:
+    """Map (paths x steps) standard normals to the standard normal increments of Brownian
+    paths built by bridge construction, so column 0 sets the end points, column 1 the
+    midpoints and so on. With low discrepancy z the first dimensions, where a Sobol
+    sequence is most uniform, then carry most of the variance of the path."""
+    n_paths, n_steps = z.shape
+    W = np.zeros((n_paths, n_steps + 1))
+    for column, (index, left, right, left_weight, right_weight, std) in enumerate(bridge_schedule(n_steps)):
+        W[:, index] = left_weight * W[:, left] + right_weight * W[:, right] + std * z[:, column]
+    return np.diff(W, axis=1)
+
+def sobol_path_normals(n_paths, n_steps, rng=None, bridge=True) -> np.ndarray:
+    """(n_paths x n_steps) normals to drive Brownian paths, one path per Sobol point, in
+    Brownian bridge order unless bridge is False."""
+    z = sobol_normals(n_paths, n_steps, rng)
+    return brownian_bridge_normals(z) if bridge else z
+
+def path_normals(n_paths, n_steps, rng=None, sampling="pseudo") -> np.ndarray:
+    """(n_paths x n_steps) standard normals for the path increments, sampling "pseudo" for
+    pseudo-random draws from rng or "sobol" for sobol_path_normals."""
+    rng = resolve_rng(rng)
+    if sampling == "pseudo":
+        return rng.standard_normal((n_paths, n_steps))
+    if sampling == "sobol":
+        return sobol_path_normals(n_paths, n_steps, rng)
+    raise ValueError(f"Unknown sampling {sampling}, expected pseudo or sobol")
+
+def rqmc_estimate(integrand, n, dimension, replicates=16, bridge=False, rng=None) -> MonteCarloEstimate:
+    """Randomised QMC estimate of E[integrand(Z)], Z dimension standard normals, the mean
+    over independently scrambled replicates of n Sobol points each, with the standard error
+    from the spread of the replicate means. bridge orders the normals for Brownian paths."""
+    rng = resolve_rng(rng)
+    means = np.array([
+        np.mean(integrand(sobol_path_normals(n, dimension, rng) if bridge else sobol_normals(n, dimension, rng)))
+        for _ in range(replicates)
+    ])
+    return MonteCarloEstimate(float(means.mean()), float(means.std(ddof=1) / math.sqrt(replicates)), n * replicates)
+
+if __name__ == '__main__':
+    """Call on the average of a Brownian path over 64 steps, pseudo-random against Sobol."""
+    from src.options_pricing.generalities.monte_carlo import MonteCarloEstimator
+
+    def asian_payoff(z):
+        paths = np.cumsum(z, axis=1) / math.sqrt(z.shape[1])
+        return np.maximum(paths.mean(axis=1), 0)
+
+    print("pseudo", MonteCarloEstimator(asian_payoff, dimension=64).estimate(16 * 1024))
+    print("sobol", rqmc_estimate(asian_payoff, 1024, 64, bridge=True))
@@ -0,0 +1,59 @@
+import numpy as np
+
+class RandomStream:
+    """Reproducible source of random numbers for a simulation job. One seed fixes the job,
+    and spawn hands out statistically independent child streams, through
+    numpy's SeedSequence, for workers or chunks of paths, so results do not depend on how
+    the work is split or ordered. Standard normals are generated in blocks of block_size
+    and handed out from the block, which makes single draws cheap. It can be passed
+    wherever a simulator takes rng, in place of a numpy Generator."""
+
+    def __init__(self, seed=None, block_size=65536):
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self.block_size = block_size
+        self._normals = np.empty(0)
+        self._position = 0
+
+    def __repr__(self):
+        return f"RandomStream(entropy={self.seed_sequence.entropy}, spawn_key={self.seed_sequence.spawn_key})"
+
+    def spawn(self, n) -> list:
+        """n independent child streams; later calls give further, different children."""
+        return [RandomStream(child, self.block_size) for child in self.seed_sequence.spawn(n)]
+
+    def standard_normal(self, size=None):
+        """Standard normals, a float if size is None, from the prefilled block."""
+        count = 1 if size is None else int(np.prod(size))
+        if count > self.block_size:
+            return self.generator.standard_normal(size)
+        if self._position + count > len(self._normals):
+            # keep what is left of the block and refill behind it
+            self._normals = np.concatenate([self._normals[self._position:], self.generator.standard_normal(self.block_size)])
+            self._position = 0
+        values = self._normals[self._position:self._position + count]
+        self._position += count
+        return float(values[0]) if size is None else values.reshape(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        return loc + scale * self.standard_normal(size)
+
+    def random(self, size=None):
+        return self.generator.random(size)
+
+def resolve_rng(rng=None):
+    """What a simulator should draw from for its rng argument: a Generator or RandomStream
+    as given, a fresh Generator for None, otherwise a RandomStream seeded with rng."""
+    if isinstance(rng, (np.random.Generator, RandomStream)):
+        return rng
+    return np.random.default_rng() if rng is None else RandomStream(rng)
+
+def as_generator(rng=None) -> np.random.Generator:
+    """numpy Generator behind rng, for code such as scipy's samplers that needs one."""
+    rng = resolve_rng(rng)
+    return rng.generator if isinstance(rng, RandomStream) else rng
+
+def spawn_streams(rng, n) -> list:
+    """n independent streams derived from rng, e.g. one per chunk of paths."""
+    rng = resolve_rng(rng)
+    return rng.spawn(n)
@@ -0,0 +1,31 @@
+import numpy as np
+from typing import NamedTuple
+
+class ResolutionResult(NamedTuple):
+    """Value computed at the cheapest resolution found to meet a tolerance.
+    resolution is whatever the engine refines, e.g. a step count or (x_mesh, dt), and
+    error_estimate the Richardson estimate of the error of value, elementwise."""
+    value: np.ndarray
+    resolution: object
+    error_estimate: np.ndarray
+
+def richardson_error(fine, coarse, refinement, order) -> np.ndarray:
+    """Estimated error of the fine value, for a method whose error falls like h^order and
+    a refinement ratio h_coarse / h_fine: (fine - coarse) / (refinement^order - 1)."""
+    return np.abs(fine - coarse) / (refinement ** order - 1)
+
+def refine_to_tolerance(values_at, resolutions, tol, order) -> ResolutionResult:
+    """Evaluate values_at(resolution) for successively finer resolutions, given as
+    (resolution, size) pairs with size the number of steps or nodes, until the Richardson
+    error estimate from the last two is within tol everywhere. Raises ValueError if the
+    last resolution still misses the tolerance."""
+    coarse = coarse_size = None
+    error = np.inf
+    for resolution, size in resolutions:
+        fine = np.asarray(values_at(resolution), dtype=float)
+        if coarse is not None:
+            error = richardson_error(fine, coarse, size / coarse_size, order)
+            if np.all(error <= tol):
+                return ResolutionResult(fine, resolution, error)
+        coarse, coarse_size = fine, size
+    raise ValueError(f"Tolerance {tol} not met by the finest resolution {resolution}, estimated error {np.max(error)}")
@@ -1,8 +1,9 @@
 import matplotlib.pyplot as plt
+import numpy as np
 from datetime import date
 from src.options_pricing.generalities import Black_Scholes_closed_form_02 as bscf
+from src.options_pricing.generalities.volatility_surface import solve_chain
 from types import FunctionType
-from importlib import resources
 
 class VolatilitySmile:
     def __init__(self, ticker:int):
@@ -45,42 +46,24 @@ class VolatilitySmile:
                 hi = mi
         return lo
 
-    def func_run(self) -> None:
-        strikes_prices = []
-        min_strike = 10000000
-        max_strike = 0
+    def implied_volatilities(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """Strikes, implied volatilities and solved mask of the chain, without plotting."""
+        _, strikes, volatilities, solved = solve_chain(self.data[self.ticker])
+        return strikes, volatilities, solved
 
-        ref = resources.files("options_chains") / self.data[self.ticker]["data_file"]
-        with open(ref, "r") as f:
-            for line in f:
-                line_array = line.strip().split()
-                strikes_prices.append((line_array[4],line_array[5]))
-                min_strike = min(min_strike, int(line_array[4]))
-                max_strike = max(max_strike, int(line_array[4]))
+    def func_run(self) -> None:
+        strikes, volatilities, solved = self.implied_volatilities()
+        min_strike = int(strikes.min())
+        max_strike = int(strikes.max())
 
-        strikes_prices.sort()
-        strikes = [] # currently not used
-        volatilities = [] # currently not used
-        strikes_out_money = []
-        volatilities_out_money = []
-        strikes_in_money = []
-        volatilities_in_money = []
-        for s,c in strikes_prices:
-            kwargs = {
-                "strike_price": float(s),
-                "percent_of_year" : 1.0 * self.delta.days / 360.0,
-                "cur_S" : self.current_price,
-                "r" : self.data[self.ticker]["one_month_rate"]
-            }
-            vlo = self.binarysearch(0.00001, 0.99999, self.vtolerance, float(c), bscf.BlackScholesCallValue, **kwargs)
-            volatilities.append(vlo) # currently not used
-            strikes.append(float(s)) # currently not used
-            if float(s) < self.current_price:
-                volatilities_in_money.append(vlo)
-                strikes_in_money.append(float(s))
-            else:
-                volatilities_out_money.append(vlo)
-                strikes_out_money.append(float(s))
+        if not solved.all():
+            print(f"No implied volatility for strikes {strikes[~solved].tolist()}")
+        in_money = solved & (strikes < self.current_price)
+        out_money = solved & (strikes >= self.current_price)
+        strikes_in_money = strikes[in_money]
+        volatilities_in_money = volatilities[in_money]
+        strikes_out_money = strikes[out_money]
+        volatilities_out_money = volatilities[out_money]
 
         plt.plot(strikes_in_money, volatilities_in_money, 'o')
         plt.plot(strikes_out_money, volatilities_out_money, 'o')
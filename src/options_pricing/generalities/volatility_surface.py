@@ -0,0 +1,135 @@
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from importlib import resources
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+from src.options_pricing.generalities.implied_volatility import implied_volatility
+from src.options_pricing.generalities.options_chain import OptionsChain
+
+def chain_path(data_file) -> str:
+    """Chain files are given either as paths or by name inside the options_chains package."""
+    if os.path.exists(data_file):
+        return os.fspath(data_file)
+    return os.fspath(resources.files("options_chains") / data_file)
+
+def solve_chain(chain_spec: dict) -> (float, np.ndarray, np.ndarray, np.ndarray):
+    """Implied volatilities of one chain snapshot.
+    chain_spec has the keys of VolatilitySmile.data entries: cur_date, exercise_date,
+    current_price, data_file and one_month_rate, plus an optional option_type.
+    Returns (time to expiry in years, strikes, volatilities, solved)."""
+    chain = OptionsChain.load(chain_path(chain_spec["data_file"]))
+    # same day count as VolatilitySmile
+    T = 1.0 * (chain_spec["exercise_date"] - chain_spec["cur_date"]).days / 360.0
+    volatilities, solved = implied_volatility(
+        chain.last, chain_spec["current_price"], 0, 0, T, chain.strike,
+        chain_spec["one_month_rate"], chain_spec.get("option_type", "call")
+    )
+    return T, chain.strike, volatilities, solved
+
+def _bracket(grid: np.ndarray, x: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Indices i0, i1 of the grid points around each x, clipped to the grid, and the weight of i1."""
+    if len(grid) == 1:
+        zeros = np.zeros(x.shape, dtype=int)
+        return zeros, zeros, np.zeros(x.shape)
+    x = np.clip(x, grid[0], grid[-1])
+    i0 = np.clip(np.searchsorted(grid, x, side="right") - 1, 0, len(grid) - 2)
+    weight = (x - grid[i0]) / (grid[i0 + 1] - grid[i0])
+    return i0, i0 + 1, weight
+
+class VolatilitySurface:
+    """Implied volatility surface of one ticker, stored as total variance sigma^2 T
+    on an (expiry x strike) grid and interpolated bilinearly in total variance.
+    Queries outside the grid use the nearest strike and a flat volatility in T."""
+
+    def __init__(self, ticker: str, cur_date: date, current_price: float, expiries, strikes, total_variance):
+        self.ticker = ticker
+        self.cur_date = cur_date
+        self.current_price = current_price
+        self.expiries = np.asarray(expiries, dtype=float)
+        self.strikes = np.asarray(strikes, dtype=float)
+        self.total_variance = np.asarray(total_variance, dtype=float)
+
+    @classmethod
+    def from_smiles(cls, ticker: str, cur_date: date, current_price: float, smiles: list) -> "VolatilitySurface":
+        """Build a surface from (T, strikes, volatilities, solved) smiles, one per expiry.
+        Each smile is interpolated onto the union of all strikes; unsolved strikes are dropped."""
+        smiles = sorted(smiles, key=lambda smile: smile[0])
+        expiries = np.array([smile[0] for smile in smiles])
+        if np.any(np.diff(expiries) <= 0):
+            raise ValueError(f"Duplicate expiries for {ticker}")
+        strikes = np.unique(np.concatenate([smile[1][smile[3]] for smile in smiles]))
+        total_variance = np.empty((len(expiries), len(strikes)))
+        for i, (T, smile_strikes, volatilities, solved) in enumerate(smiles):
+            if not solved.any():
+                raise ValueError(f"No implied volatilities for {ticker} expiry {T}")
+            total_variance[i] = np.interp(strikes, smile_strikes[solved], volatilities[solved] ** 2 * T)
+        return cls(ticker, cur_date, current_price, expiries, strikes, total_variance)
+
+    @classmethod
+    def from_chains(cls, chain_specs: list, max_workers: int = None) -> dict:
+        """Solve implied volatilities for many chain files, across a process pool, and
+        assemble one surface per ticker. chain_specs are dicts as for solve_chain with an
+        extra "ticker" key. Returns a dict from ticker to VolatilitySurface."""
+        if max_workers == 1 or len(chain_specs) == 1:
+            smiles = [solve_chain(spec) for spec in chain_specs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                smiles = list(executor.map(solve_chain, chain_specs))
+
+        surfaces = {}
+        for ticker in dict.fromkeys(spec["ticker"] for spec in chain_specs):
+            members = [i for i, spec in enumerate(chain_specs) if spec["ticker"] == ticker]
+            first = chain_specs[members[0]]
+            surfaces[ticker] = cls.from_smiles(
+                ticker, first["cur_date"], first["current_price"], [smiles[i] for i in members]
+            )
+        return surfaces
+
+    def implied_volatility(self, K, T) -> np.ndarray:
+        """Implied volatility at arbitrary strikes K and times to expiry T, broadcast together."""
+        K, T = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float))
+        T = np.clip(T, self.expiries[0], self.expiries[-1])
+        t0, t1, t_weight = _bracket(self.expiries, T)
+        k0, k1, k_weight = _bracket(self.strikes, K)
+        w = self.total_variance
+        total_variance = (
+            (1 - t_weight) * ((1 - k_weight) * w[t0, k0] + k_weight * w[t0, k1])
+            + t_weight * ((1 - k_weight) * w[t1, k0] + k_weight * w[t1, k1])
+        )
+        return np.sqrt(total_variance / T)
+
+    def price(self, K, T, r, option_type="call", S=None) -> np.ndarray:
+        """Closed form value with the volatility read off the surface."""
+        S = self.current_price if S is None else S
+        return black_scholes_value(S, 0, 0, T, K, self.implied_volatility(K, T), r, option_type)
+
+if __name__ == '__main__':
+    """Build surfaces for the chains shipped with the repo and plot a few smiles from them."""
+    chain_specs = [
+        {
+            "ticker": "aapl",
+            "cur_date": date(2025, 3, 19),
+            "exercise_date": date(2025, 4, 17),
+            "current_price": 215.24,
+            "data_file": "aapl_call_20250319_20250417",
+            "one_month_rate": 0.0437,
+        },
+        {
+            "ticker": "tsla",
+            "cur_date": date(2025, 3, 20),
+            "exercise_date": date(2025, 4, 25),
+            "current_price": 236.26,
+            "data_file": "tsla_call_20250320_20250425",
+            "one_month_rate": 0.0439,
+        },
+    ]
+    surfaces = VolatilitySurface.from_chains(chain_specs)
+    for ticker, surface in surfaces.items():
+        K = np.linspace(surface.strikes[0], surface.strikes[-1], 200)
+        plt.plot(K, surface.implied_volatility(K, surface.expiries[0]))
+    plt.legend(list(surfaces))
+    plt.xlabel("Strike Price")
+    plt.ylabel("Implied Volatility")
+    plt.show()
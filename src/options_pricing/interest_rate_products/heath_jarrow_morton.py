@@ -1,8 +1,8 @@
 import matplotlib.pyplot as plt
 import math
-import nelson_siegel_svensson
-import ho_lee
-import hull_white
+import numpy as np
+from src.options_pricing.generalities.random_streams import RandomStream, resolve_rng
+from src.options_pricing.interest_rate_products import ho_lee, hull_white, nelson_siegel_svensson
 from typing import Callable
 from enum import Enum
 
@@ -10,7 +10,8 @@ class SwapOptionType(Enum):
     RCVR = 1.0
     PYER = -1.0
 class HeathJarrowMorton():
-    def __init__(self, short_rate_model: str = "ho_lee", interest_rate_curve: str = "exponential"):
+    def __init__(self, short_rate_model: str = "ho_lee", interest_rate_curve: str = "exponential", sampling: str = "pseudo",
+                 seed=None):
         self.short_rate_model = short_rate_model
         self.interest_rate_curve = interest_rate_curve
         self.interest_rate_curve_parameters = {
@@ -29,6 +30,9 @@ class HeathJarrowMorton():
         self.dt = 0.1
         self.sigma = 0.01
         self.number_of_runs = 1000
+        self.sampling = sampling
+        # one stream per job, so a seed reproduces every run
+        self.random_stream = RandomStream(seed)
 
     def set_yield_curve(self) -> None:
         """Populate self.yield_curve."""
@@ -49,35 +53,28 @@ class HeathJarrowMorton():
             )
         return
 
-    def run_simulations(self, number_of_runs: int, short_rate_model, f0: Callable):
-        """Given Ho-Lee / Hull-White and forward function f0 = f(0,T), return interest rates and size of Money savings account."""
-        run_results_retval = []
-        M_matrix_retval = []
-        for _ in range(number_of_runs):
-            interest_rates = short_rate_model.eval_time_T_step_dt(self.T, self.dt, f0(0))
-            run_results_retval.append(interest_rates.copy())
-            M_matrix_retval.append([1])
-            for rr in range(len(interest_rates.copy()[1:])):
-                last_value = M_matrix_retval[-1][-1]
-                M_matrix_retval[-1].append(
-                    last_value * math.exp((interest_rates.copy()[rr + 1] + interest_rates.copy()[rr]) * 0.5 * .1)
-                )
-        return run_results_retval, M_matrix_retval
+    def run_simulations(self, number_of_runs: int, short_rate_model, f0: Callable, sampling: str = "pseudo", rng=None):
+        """Given Ho-Lee / Hull-White and forward function f0 = f(0,T), return interest rates and size of Money savings account.
+        sampling "sobol" drives the runs with scrambled Sobol points in Brownian bridge order.
+        Draws come from rng, by default the stream of this job.
+        All runs are simulated together, returned as (runs x timesteps + 1) arrays."""
+        rng = self.random_stream if rng is None else resolve_rng(rng)
+        interest_rates = short_rate_model.simulate_paths(self.T, self.dt, f0(0), number_of_runs, rng, sampling)
+        return interest_rates, self.money_market_account(interest_rates, self.dt)
+
+    def money_market_account(self, interest_rates, dt: float):
+        """Money savings account M(t_i) = exp(integral of r from 0 to t_i) for each run, the
+        integral by the cumulative trapezoid rule along the rows of interest_rates."""
+        M_matrix = np.ones_like(interest_rates)
+        np.cumsum(0.5 * dt * (interest_rates[:, 1:] + interest_rates[:, :-1]), axis=1, out=M_matrix[:, 1:])
+        np.exp(M_matrix[:, 1:], out=M_matrix[:, 1:])
+        return M_matrix
 
     def average_simulations(self, number_of_runs, time_values, simulation_run_results, simulation_M_matrix):
         """Average Ho-Lee / Hull-White results for interest rate and for Money savings account growth."""
-        averaged_results_retval = []
-        P_graph_retval = []
-        for i in range(len(time_values)):
-            s = 0
-            ms = 0
-            n = 0
-            for j in range(number_of_runs):
-                s += simulation_run_results[j][i]
-                ms += 1.0 / simulation_M_matrix[j][i]
-                n += 1
-            averaged_results_retval.append(1.0 * s / n)
-            P_graph_retval.append(1.0 * ms / n)
+        steps = len(time_values)
+        averaged_results_retval = np.mean(simulation_run_results[:number_of_runs, :steps], axis=0)
+        P_graph_retval = np.mean(1.0 / simulation_M_matrix[:number_of_runs, :steps], axis=0)
         return averaged_results_retval, P_graph_retval
 
     def plot_graph(self, time_values, P_graph):
@@ -116,7 +113,7 @@ class HeathJarrowMorton():
             hl = ho_lee.HoLee.create(theta, self.sigma)
 
             # Do a bunch of Ho-Lee simulations for interest rates and for Money savings account value.
-            run_results, M_matrix = self.run_simulations(self.number_of_runs, hl, f0)
+            run_results, M_matrix = self.run_simulations(self.number_of_runs, hl, f0, self.sampling)
 
             # Average the simulations.
             time_values = [self.dt * i for i in range(1, 101)]
@@ -159,7 +156,7 @@ class HeathJarrowMorton():
             plt.show()
 
             # Do a bunch of Ho-Lee simulations for interest rates and for Money savings account value.
-            run_results, M_matrix = self.run_simulations(self.number_of_runs, hw, f0)
+            run_results, M_matrix = self.run_simulations(self.number_of_runs, hw, f0, self.sampling)
 
             # Average the simulations.
             time_values = [self.dt * i for i in range(1, 101)]
@@ -276,31 +273,10 @@ class HeathJarrowMorton():
         # hl = ho_lee.HoLee(theta, self.sigma)
 
         hl = ho_lee.HoLee.create(theta_vec, self.sigma)
-        run_results = []
-        M_matrix = []
         number_of_runs = 1000
-        for _ in range(number_of_runs):
-            interest_rates = hl.eval_theta_list(f0_vec[0], 0.1, theta_vec)
-            run_results.append(interest_rates.copy())
-            M_matrix.append([1])
-            for rr in range(len(interest_rates.copy()[1:])):
-                last_value = M_matrix[-1][-1]
-                M_matrix[-1].append(
-                    last_value * math.exp((interest_rates.copy()[rr + 1] + interest_rates.copy()[rr]) * 0.5 * .1)
-                )
-
-        averaged_results = []
-        P_graph = []
-        for i in range(len(run_results[0])):
-            s = 0
-            ms = 0
-            n = 0
-            for j in range(number_of_runs):
-                s += run_results[j][i]
-                ms += 1.0 / M_matrix[j][i]
-                n += 1
-            averaged_results.append(1.0 * s / n)
-            P_graph.append(1.0 * ms / n)
+        run_results = hl.simulate_paths(len(theta_vec) * 0.1, 0.1, f0_vec[0], number_of_runs, self.random_stream, self.sampling)
+        M_matrix = self.money_market_account(run_results, 0.1)
+        averaged_results, P_graph = self.average_simulations(number_of_runs, run_results[0], run_results, M_matrix)
 
         plt.plot(time_values[:-1], P_graph, 'o-')
         plt.plot(time_values, P_vec, '-')
@@ -309,7 +285,7 @@ class HeathJarrowMorton():
         return
 
         # Do a bunch of Ho-Lee simulations for interest rates and for Money savings account value.
-        run_results, M_matrix = self.run_simulations(self.number_of_runs, hl, f0)
+        run_results, M_matrix = self.run_simulations(self.number_of_runs, hl, f0, self.sampling)
 
         # Average the simulations.
         time_values = [self.dt * i for i in range(1, 101)]
@@ -2,6 +2,23 @@ import matplotlib.pyplot as plt
 from typing import Callable, Generator
 import numpy as np
 import math
+from src.options_pricing.generalities.qmc import path_normals
+from src.options_pricing.generalities.random_streams import resolve_rng
+
+def ho_lee_paths(r_begin: float, theta_values: np.ndarray, sigma: float, dt: float, normals: np.ndarray) -> np.ndarray:
+    """Short rate paths r_i+1 = r_i + theta_i dt + sigma sqrt(dt) z_i, one per row of the
+    (paths x steps) normals z, as a (paths x steps + 1) array starting from r_begin."""
+    increments = sigma * math.sqrt(dt) * normals
+    increments += np.asarray(theta_values, dtype=float) * dt
+    paths = np.empty((normals.shape[0], normals.shape[1] + 1))
+    paths[:, 0] = r_begin
+    np.cumsum(increments, axis=1, out=paths[:, 1:])
+    paths[:, 1:] += r_begin
+    return paths
+
+def time_steps(T: float, dt: float) -> int:
+    """Number of whole timesteps of dt up to T."""
+    return int(T / dt + 1e-9)
 
 class HoLee():
     @classmethod
@@ -10,30 +27,38 @@ class HoLee():
         if isinstance(theta, Callable):
             # theta is a function
             return HoLeeFunction(theta, sigma)
-        elif isinstance(theta, list):
+        elif isinstance(theta, (list, tuple, np.ndarray)):
             # theta is a list
             return HoLeeList(theta, sigma)
         else:
             raise ValueError("Invalid argument type")
 
+    def simulate_paths(self, T: float, dt: float, r_begin: float, n_paths: int, rng=None, sampling: str = "pseudo",
+                       normals=None) -> np.ndarray:
+        """(n_paths x steps + 1) Ho-Lee short rate paths from r_begin to T, normals as qmc.path_normals."""
+        if normals is None:
+            normals = path_normals(n_paths, time_steps(T, dt), rng, sampling)
+        return ho_lee_paths(r_begin, self.theta_values(T, dt), self.sigma, dt, np.asarray(normals).reshape(n_paths, -1))
+
+    def eval_time_T_step_dt(self, T: float, dt: float, r_begin: float, normals=None, rng=None):
+        """One short rate path from r_begin to T, as a list."""
+        return self.simulate_paths(T, dt, r_begin, 1, rng, normals=normals)[0].tolist()
+
 class HoLeeFunction(HoLee):
     """HoLee when theta is defined as a function."""
     def __init__(self, theta: Callable[float,float] = lambda x : 0, sigma: float = 0.01):
         self.theta = theta
         self.sigma = sigma # sigma is always a float
 
-    def eval_float_arg(self, r0 : float, rng : Generator, dt: float):
-        cur_theta = self.theta
-        cur_theta_val = cur_theta(0)(r0)
-        return r0 + cur_theta_val * dt + self.sigma * rng.standard_normal() * math.pow(dt, 0.5)
+    def eval_float_arg(self, r0 : float, rng : Generator, dt: float, z: float = None, t: float = 0.0):
+        """One timestep from r0 at time t, with theta(0)(t) as in simulate_paths."""
+        cur_theta_val = self.theta(0)(t)
+        z = rng.standard_normal() if z is None else z
+        return r0 + cur_theta_val * dt + self.sigma * z * math.pow(dt, 0.5)
 
-    def eval_time_T_step_dt(self, T: float, dt: float, r_begin: float):
-        num_timesteps = int(T/dt)
-        rng = np.random.default_rng()
-        return_value = [r_begin for _ in range(num_timesteps + 1)]
-        for i in range(1, num_timesteps + 1):
-            return_value[i] = self.eval_float_arg(return_value[i-1], rng, dt)
-        return return_value
+    def theta_values(self, T: float, dt: float) -> np.ndarray:
+        """The drift theta(0) at the start of every timestep up to T."""
+        return np.array([self.theta(0)(i * dt) for i in range(time_steps(T, dt))])
 
     def eval_ZCB_price(self, t:float, T:float, P0: Callable, f0: Callable, r: Callable) -> float:
         """Ho-Lee formula for P(t,T)."""
@@ -51,32 +76,28 @@ class HoLeeList(HoLee):
         self.theta = theta
         self.sigma = sigma # sigma is always a float
 
-    def eval_theta_list(self, r0: float, dt: float, theta_vec: list):
-        rng = np.random.default_rng()
-        retval = [r0]
-        for ii in range(len(theta_vec)):
-            r_prev = retval[-1]
-            retval.append(
-                r_prev + theta_vec[ii] * dt + self.sigma * rng.standard_normal() * math.pow(dt, 0.5)
-            )
-        return retval
-    def eval_float_arg(self, r0 : float, rng : Generator, dt: float):
-        cur_theta = self.theta
-        cur_theta_val = cur_theta(0)(r0)
-        return r0 + cur_theta_val * dt + self.sigma * rng.standard_normal() * math.pow(dt, 0.5)
-
-    def eval_time_T_step_dt(self, T: float, dt: float, r_begin: float):
-        num_timesteps = int(T/dt)
-        rng = np.random.default_rng()
-        return_value = [r_begin for _ in range(num_timesteps + 1)]
-        for i in range(1, num_timesteps + 1):
-            return_value[i] = self.eval_float_arg(return_value[i-1], rng, dt)
-        return return_value
+    def theta_values(self, T: float, dt: float) -> np.ndarray:
+        """The first entries of the theta list, one per timestep up to T."""
+        num_timesteps = time_steps(T, dt)
+        if num_timesteps > len(self.theta):
+            raise ValueError(f"theta has {len(self.theta)} values, {num_timesteps} timesteps needed")
+        return np.asarray(self.theta[:num_timesteps], dtype=float)
+
+    def eval_theta_list(self, r0: float, dt: float, theta_vec: list, normals=None, rng=None):
+        if normals is None:
+            normals = resolve_rng(rng).standard_normal(len(theta_vec))
+        return ho_lee_paths(r0, theta_vec, self.sigma, dt, np.asarray(normals).reshape(1, -1))[0].tolist()
+
+    def eval_float_arg(self, r0 : float, rng : Generator, dt: float, z: float = None, t: float = 0.0):
+        """One timestep from r0 at time t, with the theta of the timestep starting at t."""
+        cur_theta_val = self.theta[time_steps(t, dt)]
+        z = rng.standard_normal() if z is None else z
+        return r0 + cur_theta_val * dt + self.sigma * z * math.pow(dt, 0.5)
 
 
 if __name__=="__main__":
     time_values = [i/10 for i in range(0,101)]
-    hl = HoLee(lambda x : lambda x: 0.005)
+    hl = HoLee.create(lambda x : lambda x: 0.005, 0.01)
     interest_rates = hl.eval_time_T_step_dt(10, 0.1, 0.0)
     plt.plot(time_values, interest_rates,'o-')
     plt.legend([f"theta: {hl.theta}\n sigma: {hl.sigma}"])
@@ -2,6 +2,42 @@ import matplotlib.pyplot as plt
 from typing import Callable, Generator
 import numpy as np
 import math
+from src.options_pricing.generalities.qmc import path_normals, sobol_normals
+from src.options_pricing.interest_rate_products.ho_lee import time_steps
+
+def hull_white_paths(r_begin: float, theta_values: np.ndarray, llambda: float, sigma: float, dt: float,
+                     normals: np.ndarray) -> np.ndarray:
+    """Short rate paths by Euler steps r_i+1 = r_i + llambda (theta_i - r_i) dt + sigma sqrt(dt) z_i,
+    one per row of the (paths x steps) normals z, as a (paths x steps + 1) array starting
+    from r_begin. The steps run over time with all paths updated together."""
+    shocks = sigma * math.sqrt(dt) * normals
+    shocks += llambda * dt * np.asarray(theta_values, dtype=float)
+    paths = np.empty((normals.shape[0], normals.shape[1] + 1))
+    paths[:, 0] = r_begin
+    decay = 1 - llambda * dt
+    for i in range(normals.shape[1]):
+        np.multiply(paths[:, i], decay, out=paths[:, i + 1])
+        paths[:, i + 1] += shocks[:, i]
+    return paths
+
+def ornstein_uhlenbeck_moments(llambda: float, sigma: float, h) -> tuple:
+    """Exact one-step moments of dr = llambda (theta - r) dt + sigma dW over steps of length
+    h, for r and its integral I over the step, as (exp(-llambda h), B(h), var r, cov(r, I),
+    var I) with B(h) = (1 - exp(-llambda h)) / llambda. A given r at the step start shifts
+    the means by r exp(-llambda h) and r B(h); llambda = 0 gives the Brownian limits."""
+    h = np.asarray(h, dtype=float)
+    if llambda == 0:
+        return np.ones_like(h), h, sigma * sigma * h, 0.5 * sigma * sigma * h * h, sigma * sigma * h ** 3 / 3
+    x = llambda * h
+    B = -np.expm1(-x) / llambda
+    var_r = sigma * sigma * -np.expm1(-2 * x) / (2 * llambda)
+    cov = 0.5 * sigma * sigma * B * B
+    # x - 2 (1 - e^-x) + (1 - e^-2x) / 2 cancels to x^3/3 for small x, so use its series there
+    with np.errstate(invalid="ignore"):
+        g = np.where(x < 1e-2, x ** 3 / 3 - x ** 4 / 4 + 7 * x ** 5 / 60 - x ** 6 / 24,
+                     x + 2 * np.expm1(-x) - 0.5 * np.expm1(-2 * x))
+    var_I = sigma * sigma * g / llambda ** 3
+    return np.exp(-x), B, var_r, cov, var_I
 
 class HullWhiteFunction():
     """Hull-White model."""
@@ -12,22 +48,79 @@ class HullWhiteFunction():
         self.sigma = sigma  # sigma is always a float
 
 
-    def eval_float_arg(self, r0: float, rng: Generator, dt: float):
-        # cur_theta = self.theta
-        # cur_theta_val = cur_theta(0)(r0)
+    def eval_float_arg(self, r0: float, rng: Generator, dt: float, z: float = None, t: float = 0.0):
+        """One Euler timestep from r0 at time t, with theta(0)(t) as in simulate_paths."""
+        z = rng.standard_normal() if z is None else z
         return (
                 r0
-                + self.llambda * (self.theta(0)(r0) + - r0) * dt
-                + self.sigma * rng.standard_normal() * math.pow(dt, 0.5)
+                + self.llambda * (self.theta(0)(t) - r0) * dt
+                + self.sigma * z * math.pow(dt, 0.5)
         )
 
-    def eval_time_T_step_dt(self, T: float, dt: float, r_begin: float):
-        num_timesteps = int(T / dt)
-        rng = np.random.default_rng()
-        return_value = [r_begin for _ in range(num_timesteps + 1)]
-        for i in range(1, num_timesteps + 1):
-            return_value[i] = self.eval_float_arg(return_value[i - 1], rng, dt)
-        return return_value
+    def theta_values(self, T: float, dt: float) -> np.ndarray:
+        """The mean reversion level theta(0) at the start of every timestep up to T."""
+        return np.array([self.theta(0)(i * dt) for i in range(time_steps(T, dt))])
+
+    def simulate_paths(self, T: float, dt: float, r_begin: float, n_paths: int, rng=None, sampling: str = "pseudo",
+                       normals=None) -> np.ndarray:
+        """(n_paths x steps + 1) Euler paths of the short rate from r_begin to T, see hull_white_paths."""
+        if normals is None:
+            normals = path_normals(n_paths, time_steps(T, dt), rng, sampling)
+        return hull_white_paths(r_begin, self.theta_values(T, dt), self.llambda, self.sigma, dt,
+                                np.asarray(normals).reshape(n_paths, -1))
+
+    def eval_time_T_step_dt(self, T: float, dt: float, r_begin: float, normals=None, rng=None):
+        """One Euler path of the short rate from r_begin to T, as a list."""
+        return self.simulate_paths(T, dt, r_begin, 1, rng, normals=normals)[0].tolist()
+
+    def exact_paths(self, times, r_begin: float, n_paths: int, rng=None, sampling: str = "pseudo", normals=None,
+                    quadrature_points: int = 16) -> (np.ndarray, np.ndarray):
+        """Short rate r and its integral from 0, both (n_paths x len(times) + 1), at 0 and the
+        increasing dates times, sampled exactly from the joint Gaussian transition of the
+        Ornstein-Uhlenbeck dynamics, one step per date however far apart they are. With a
+        constant theta this is the Vasicek model. The contributions of theta(0)(t) to the
+        means are integrated by Gauss-Legendre quadrature over each step. Two normals per
+        step, correlated by the Cholesky factor of the step covariance, come from rng (a
+        Generator, a RandomStream or a seed) or scrambled Sobol points with sampling
+        "sobol", unless normals, (n_paths x steps x 2), are given."""
+        grid = np.concatenate([[0.0], np.asarray(times, dtype=float)])
+        h = np.diff(grid)
+        if np.any(h <= 0):
+            raise ValueError("times must be increasing and after 0")
+        steps = len(h)
+        if normals is None:
+            normals = sobol_normals(n_paths, 2 * steps, rng) if sampling == "sobol" else path_normals(n_paths, 2 * steps, rng, sampling)
+        normals = np.asarray(normals).reshape(n_paths, steps, 2)
+
+        # deterministic theta parts of the means, with the step end as origin: llambda times
+        # the integrals of exp(-llambda (t - u)) theta(u) and of B(t - u) theta(u)
+        nodes, weights = np.polynomial.legendre.leggauss(quadrature_points)
+        u = grid[:-1, None] + 0.5 * h[:, None] * (nodes + 1)
+        theta_u = np.array([[self.theta(0)(v) for v in row] for row in u])
+        decay_u = np.exp(-self.llambda * (grid[1:, None] - u))
+        theta_r = 0.5 * h * np.sum(weights * self.llambda * decay_u * theta_u, axis=1)
+        theta_I = 0.5 * h * np.sum(weights * (1 - decay_u) * theta_u, axis=1)
+
+        decay, B, var_r, cov, var_I = ornstein_uhlenbeck_moments(self.llambda, self.sigma, h)
+        L11 = np.sqrt(var_r)
+        L21 = cov / L11
+        L22 = np.sqrt(np.maximum(var_I - L21 * L21, 0))
+
+        rates = np.empty((n_paths, steps + 1))
+        integrals = np.zeros((n_paths, steps + 1))
+        rates[:, 0] = r_begin
+        for i in range(steps):
+            z_r, z_I = normals[:, i, 0], normals[:, i, 1]
+            integrals[:, i + 1] = integrals[:, i] + B[i] * rates[:, i] + theta_I[i] + L21[i] * z_r + L22[i] * z_I
+            rates[:, i + 1] = decay[i] * rates[:, i] + theta_r[i] + L11[i] * z_r
+        return rates, integrals
+
+    def discount_factors(self, times, r_begin: float, n_paths: int, rng=None, sampling: str = "pseudo") -> np.ndarray:
+        """exp(-integral of r from 0 to t) at each of the dates times, e.g. coupon dates, for
+        every path, (n_paths x len(times)), from exact_paths. Their mean over paths is an
+        unbiased estimate of the discount curve P(0, t)."""
+        _, integrals = self.exact_paths(times, r_begin, n_paths, rng, sampling)
+        return np.exp(-integrals[:, 1:])
 
     def eval_ZCB_price(self, t:float, T:float, llambda: float, P0: Callable, f0: Callable, r: Callable, frf: Callable) -> float:
         """Hull-White formula for P(t,T)."""
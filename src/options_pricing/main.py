@@ -3,7 +3,7 @@ import numpy as np
 from src.options_pricing.generalities.Black_Scholes_closed_form_02 import BlackScholesCallValue
 from src.options_pricing.generalities.forward_euler import forward_euler
 from implicit import backward_euler
-from src.options_pricing.generalities.binomial import get_binary_value
+from src.options_pricing.generalities.binomial import binomial_values_to_tolerance
 
 if __name__ == '__main__':
     # stock and option parameters
@@ -29,13 +29,10 @@ if __name__ == '__main__':
     implicit_S, implicit_V = backward_euler(r, sigma, E, 0, 100)
     plt.plot(implicit_S, implicit_V)
 
-    # binomial tree solution
-    bin_S = [i for i in range(1, 2 * E + 1)]
-    bin_V = []
-    for ii in range(len(bin_S)):
-        bin_V.append(
-            get_binary_value(r, sigma, bin_S[ii], E, 45, 50, 500, "call")
-        )
+    # binomial tree solution, with as many steps as it takes to get within a cent
+    bin_S = np.arange(1, 2 * E + 1)
+    bin_V, bin_steps, bin_error = binomial_values_to_tolerance(bin_S, 0, 45, 50, E, sigma, r, 0.01, "call")
+    print("binomial steps", bin_steps, "estimated error", bin_error.max())
     plt.plot(bin_S, bin_V)
 
     # plot
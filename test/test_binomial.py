@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.binomial import binomial_chain_values, binomial_greeks, binomial_values_to_tolerance, binomial_values, get_binary_value, TREE_SCHEMES
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+from src.options_pricing.generalities.Black_Scholes_greeks import black_scholes_greeks
+
+class TestBinomial(unittest.TestCase):
+
+    def test_european_against_closed_form(self):
+        S = np.arange(30.0, 71.0, 5.0)
+        for option_type in ["call", "put"]:
+            tree = binomial_values(S, 0, 45, 50, 50, 0.1, 0.05, 500, option_type)
+            exact = black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, option_type)
+            np.testing.assert_allclose(tree, exact, atol=0.01)
+
+    def test_strip_matches_single_contracts(self):
+        S = np.array([40.0, 50.0, 60.0])
+        E = np.array([45.0, 50.0, 55.0])
+        strip = binomial_values(S, 0, 45, 50, E, 0.1, 0.05, 200, "put")
+        single = [get_binary_value(0.05, 0.1, S[i], E[i], 45, 50, 200, "put") for i in range(3)]
+        np.testing.assert_allclose(strip, single, rtol=1e-12)
+
+    def test_american_put(self):
+        # Longstaff and Schwartz (2001), S=36, E=40, r=0.06, sigma=0.2, T=1
+        value = binomial_values(36, 0, 0, 1, 40, 0.2, 0.06, 1000, "put", american=True)
+        self.assertAlmostEqual(float(value), 4.486, 2)
+
+    def test_expired_contract_in_strip(self):
+        T = np.array([45.0, 50.0, 45.0])
+        for american in (False, True):
+            strip = binomial_values(np.array([40.0, 50.0, 60.0]), 0, 45, T, 50, 0.1, 0.05, 200, "put", american=american)
+            self.assertTrue(np.all(np.isfinite(strip)))
+            self.assertEqual(strip[0], 10.0)
+            self.assertEqual(strip[2], 0.0)
+            live = binomial_values(50, 0, 45, 50, 50, 0.1, 0.05, 200, "put", american=american)
+            self.assertAlmostEqual(strip[1], float(live), 12)
+
+    def test_chain_on_shared_lattice(self):
+        strikes = np.array([45.0, 50.0, 55.0])
+        option_types = ["call", "put", "straddle"]
+        chain = binomial_chain_values(50, 0, 45, 50, np.tile(strikes, 3), 0.1, 0.05, 200, np.repeat(option_types, 3), american=True)
+        for i, option_type in enumerate(option_types):
+            strip = binomial_values(50, 0, 45, 50, strikes, 0.1, 0.05, 200, option_type, american=True)
+            np.testing.assert_allclose(chain[3 * i:3 * i + 3], strip, rtol=1e-12)
+
+    def test_european_chain_as_one_expectation(self):
+        strikes = np.array([45.0, 50.0, 55.0])
+        option_types = ["call", "put", "straddle"]
+        for scheme in TREE_SCHEMES:
+            chain = binomial_chain_values(50, 0.01, 45, 50, np.tile(strikes, 3), 0.1, 0.05, 201, np.repeat(option_types, 3), scheme=scheme)
+            for i, option_type in enumerate(option_types):
+                strip = binomial_values(50, 0.01, 45, 50, strikes, 0.1, 0.05, 201, option_type, scheme=scheme)
+                np.testing.assert_allclose(chain[3 * i:3 * i + 3], strip, rtol=1e-10)
+
+    def test_expired_chain(self):
+        strikes = np.array([45.0, 50.0, 55.0])
+        for american in (False, True):
+            chain = binomial_chain_values(50, 0, 50, 50, strikes, 0.1, 0.05, 200, ["call", "put", "straddle"], american=american)
+            np.testing.assert_array_equal(chain, [5.0, 0.0, 5.0])
+
+    def test_fast_converging_schemes(self):
+        exact = float(black_scholes_value(100, 0, 0, 1, 100, 0.2, 0.05))
+        leisen_reimer = float(binomial_values(100, 0, 0, 1, 100, 0.2, 0.05, 51, scheme="leisen_reimer", richardson=True))
+        bbs = float(binomial_values(100, 0, 0, 1, 100, 0.2, 0.05, 100, scheme="bbs", richardson=True))
+        self.assertLess(abs(leisen_reimer - exact), 1e-4)
+        self.assertLess(abs(bbs - exact), 2e-4)
+        for scheme in TREE_SCHEMES:
+            value = binomial_values(36, 0, 0, 1, 40, 0.2, 0.06, 200, "put", american=True, scheme=scheme, richardson=True)
+            self.assertAlmostEqual(float(value), 4.4867, 2)
+
+    def test_greeks_against_closed_form(self):
+        S = np.array([80.0, 100.0, 120.0])
+        for option_type in ["call", "put"]:
+            tree = binomial_greeks(S, 0.02, 0, 1, 100, 0.2, 0.05, 201, option_type, scheme="leisen_reimer")
+            exact = black_scholes_greeks(S, 0.02, 0, 1, 100, 0.2, 0.05, option_type)
+            for name, atol in [("value", 1e-3), ("delta", 1e-3), ("gamma", 1e-3), ("vega", 0.01),
+                               ("theta", 0.1), ("rho", 0.01), ("dividend_rho", 0.01)]:
+                np.testing.assert_allclose(getattr(tree, name), getattr(exact, name), atol=atol, err_msg=name)
+        american = binomial_greeks(36, 0, 0, 1, 40, 0.2, 0.06, 500, "put", american=True)
+        self.assertAlmostEqual(float(american.value), 4.486, 2)
+        self.assertTrue(-1 < float(american.delta) < 0 and float(american.gamma) > 0)
+
+    def test_expired_greeks(self):
+        S, T = np.array([40.0, 50.0, 60.0]), np.array([45.0, 50.0, 45.0])
+        for option_type in ["call", "put"]:
+            tree = binomial_greeks(S, 0, 45, T, 50, 0.1, 0.05, 100, option_type)
+            exact = black_scholes_greeks(S[[0, 2]], 0, 45, 45, 50, 0.1, 0.05, option_type)
+            for name in tree._fields:
+                np.testing.assert_array_equal(getattr(tree, name)[[0, 2]], getattr(exact, name), err_msg=name)
+            live = binomial_greeks(50, 0, 45, 50, 50, 0.1, 0.05, 100, option_type)
+            for name in tree._fields:
+                self.assertAlmostEqual(getattr(tree, name)[1], float(getattr(live, name)), 12, msg=name)
+
+    def test_values_to_tolerance(self):
+        S = np.array([40.0, 50.0, 60.0])
+        exact = black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, "put")
+        for scheme in TREE_SCHEMES:
+            result = binomial_values_to_tolerance(S, 0, 45, 50, 50, 0.1, 0.05, 1e-3, "put", scheme=scheme)
+            self.assertTrue(np.all(result.error_estimate <= 1e-3))
+            np.testing.assert_allclose(result.value, exact, atol=1e-3)
+        self.assertEqual(binomial_values_to_tolerance(S, 0, 45, 50, 50, 0.1, 0.05, 1e-3, "put").resolution, 800)
+        with self.assertRaises(ValueError):
+            binomial_values_to_tolerance(S, 0, 45, 50, 50, 0.1, 0.05, 1e-6, "put", max_steps=100)
+
+
+if __name__=='__main__':
+    unittest.main()
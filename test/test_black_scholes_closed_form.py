@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import (
+    BlackScholesCallValue, BlackScholesPutValue, black_scholes_call_put, black_scholes_value
+)
+
+class TestBlackScholesClosedForm(unittest.TestCase):
+
+    def test_call_value(self):
+        # Hull's textbook example: S=42, E=40, r=0.1, sigma=0.2, six months to expiry
+        call = BlackScholesCallValue([42], 0, 0, 0.5, 40, 0.2, 0.1)
+        put = BlackScholesPutValue([42], 0, 0, 0.5, 40, 0.2, 0.1)
+        self.assertAlmostEqual(call[0], 4.7594, 4)
+        self.assertAlmostEqual(put[0], 0.8086, 4)
+
+    def test_put_call_parity(self):
+        S = np.linspace(1, 100, 990)
+        call, put = black_scholes_call_put(S, 0.01, 45, 50, 50, 0.1, 0.05)
+        parity = S * np.exp(-0.01 * 5) - 50 * np.exp(-0.05 * 5)
+        np.testing.assert_allclose(call - put, parity, atol=1e-10)
+
+    def test_expiry_and_broadcasting(self):
+        S = np.array([40.0, 50.0, 60.0])
+        t = np.array([[50.0], [45.0]])
+        call = black_scholes_value(S, 0, t, 50, 50, 0.1, 0.05, "call")
+        self.assertEqual(call.shape, (2, 3))
+        np.testing.assert_allclose(call[0], [0, 0, 10])
+        self.assertGreater(call[1, 1], 0)
+        straddle = black_scholes_value(S, 0, 50, 50, 50, 0.1, 0.05, "straddle")
+        np.testing.assert_allclose(straddle, [10, 0, 10])
+
+
+if __name__=='__main__':
+    unittest.main()
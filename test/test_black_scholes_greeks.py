@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+from src.options_pricing.generalities.Black_Scholes_greeks import black_scholes_greeks
+
+class TestBlackScholesGreeks(unittest.TestCase):
+
+    def test_against_finite_differences(self):
+        S = np.array([40.0, 50.0, 60.0])
+        D, t, T, E, sigma, r = 0.02, 0.0, 0.75, 50.0, 0.3, 0.05
+        h = 1e-4
+        for option_type in ["call", "put"]:
+            V = lambda S=S, D=D, t=t, sigma=sigma, r=r: black_scholes_value(S, D, t, T, E, sigma, r, option_type)
+            greeks = black_scholes_greeks(S, D, t, T, E, sigma, r, option_type)
+            np.testing.assert_allclose(greeks.value, V(), atol=1e-12)
+            np.testing.assert_allclose(greeks.delta, (V(S=S + h) - V(S=S - h)) / (2 * h), atol=1e-6)
+            np.testing.assert_allclose(greeks.gamma, (V(S=S + h) - 2 * V() + V(S=S - h)) / (h * h), atol=1e-4)
+            np.testing.assert_allclose(greeks.vega, (V(sigma=sigma + h) - V(sigma=sigma - h)) / (2 * h), atol=1e-5)
+            np.testing.assert_allclose(greeks.theta, (V(t=t + h) - V(t=t - h)) / (2 * h), atol=1e-5)
+            np.testing.assert_allclose(greeks.rho, (V(r=r + h) - V(r=r - h)) / (2 * h), atol=1e-5)
+            np.testing.assert_allclose(greeks.dividend_rho, (V(D=D + h) - V(D=D - h)) / (2 * h), atol=1e-5)
+
+    def test_expiry(self):
+        greeks = black_scholes_greeks([40.0, 60.0], 0, 50, 50, 50, 0.1, 0.05, "put")
+        np.testing.assert_allclose(greeks.value, [10, 0])
+        np.testing.assert_allclose(greeks.delta, [-1, 0])
+        np.testing.assert_allclose(greeks.gamma, [0, 0])
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.brownian_motion import (
+    brownian_motion_0_to_1, brownian_path_chunks, brownian_paths,
+)
+
+class TestBrownianMotion(unittest.TestCase):
+
+    def test_moments(self):
+        paths = brownian_paths(20000, 50, 0.02, mu=0.5, x0=1.0, rng=np.random.default_rng(1))
+        self.assertEqual(paths.shape, (20000, 51))
+        np.testing.assert_array_equal(paths[:, 0], 1.0)
+        # X(1) ~ N(x0 + mu, 1)
+        self.assertAlmostEqual(paths[:, -1].mean(), 1.5, delta=0.03)
+        self.assertAlmostEqual(paths[:, -1].var(), 1.0, delta=0.03)
+        # dX = dt^0.75 shrinks the variance to dt^0.5 at t = 1
+        paths = brownian_paths(20000, 100, 0.01, dX_dt_exp=0.75, rng=np.random.default_rng(2))
+        self.assertAlmostEqual(paths[:, -1].var(), 0.1, delta=0.005)
+
+    def test_chunks_match_one_draw(self):
+        paths = brownian_paths(250, 40, 0.025, mu=0.1, rng=np.random.default_rng(3))
+        chunks = list(brownian_path_chunks(250, 40, 0.025, mu=0.1, chunk_size=100, rng=np.random.default_rng(3)))
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+        np.testing.assert_allclose(np.vstack(chunks), paths)
+
+    def test_zero_to_one(self):
+        t, y = brownian_motion_0_to_1(0.001)
+        self.assertEqual(len(t), 1001)
+        self.assertEqual(len(y), 1001)
+        self.assertEqual(y[0], 0)
+        self.assertAlmostEqual(t[-1], 1.0)
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+from scipy.stats import norm
+from src.options_pricing.generalities.brownian_motion_first_hitting_time import brownian_until_hit, first_hitting_times
+
+class TestFirstHittingTime(unittest.TestCase):
+
+    def test_bridge_removes_step_bias(self):
+        # reflection principle, P(hit 1 by time 1) = 2 (1 - N(1)) for standard Brownian motion
+        exact = 2 * (1 - norm.cdf(1))
+        bridged = first_hitting_times(0, 1, 0, 1, 1, 200000, dt=0.1, rng=np.random.default_rng(0))
+        self.assertAlmostEqual(bridged.hit.mean(), exact, delta=0.005)
+        stepped = first_hitting_times(0, 1, 0, 1, 1, 200000, dt=0.1, bridge=False, rng=np.random.default_rng(0))
+        self.assertLess(stepped.hit.mean(), exact - 0.05)
+        np.testing.assert_array_equal(bridged.times[~bridged.hit], 1)
+
+    def test_mean_and_median(self):
+        # with drift the hitting time is inverse Gaussian with mean barrier / mu
+        result = first_hitting_times(0, 1, 0.5, 1, 200, 50000, dt=0.01, rng=np.random.default_rng(1))
+        self.assertTrue(result.hit.all())
+        self.assertAlmostEqual(result.mean, 2, delta=0.05)
+        self.assertEqual(result.median, np.median(result.times))
+
+    def test_single_path(self):
+        self.assertEqual(brownian_until_hit(1, 1, 0, 0.05, 100), 0)
+        self.assertEqual(brownian_until_hit(0, 1, 0, 1e-9, 100), 100)
+        self.assertLessEqual(brownian_until_hit(0, 1, 0.5, 0.05, 100), 3)
+
+
+if __name__=='__main__':
+    unittest.main()
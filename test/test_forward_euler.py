@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.forward_euler import forward_euler, forward_euler_to_tolerance
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+from src.options_pricing.generalities.Black_Scholes_greeks import black_scholes_greeks
+
+class TestForwardEuler(unittest.TestCase):
+
+    def test_against_closed_form(self):
+        # final_time = sigma^2 (T - t) / 2 = 0.025 is t = 45 for T = 50
+        for option_type in ["call", "put", "straddle"]:
+            S, V = forward_euler(0.05, 0.1, 50, 0, 100, 0, option_type)
+            exact = black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, option_type)
+            np.testing.assert_allclose(V, exact, atol=0.01)
+
+    def test_mesh_and_final_time(self):
+        S, V = forward_euler(0.05, 0.2, 50, 0, 150, 0, "put", x_mesh=400, final_time=0.02)
+        self.assertEqual(len(S), 401)
+        exact = black_scholes_value(S, 0, 0, 1, 50, 0.2, 0.05, "put")
+        np.testing.assert_allclose(V, exact, atol=0.02)
+
+    def test_recorded_slices(self):
+        solution = forward_euler(0.05, 0.1, 50, 0, 100, 0, "call", record=[0.005, 0.015, 0.025])
+        S = np.linspace(30, 70, 41)
+        for t in [45, 47, 49]:
+            np.testing.assert_allclose(solution.value(S, 50 - t), black_scholes_value(S, 0, t, 50, 50, 0.1, 0.05), atol=0.01)
+
+    def test_clustered_grid(self):
+        S, V = forward_euler(0.05, 0.1, 50, 0, 100, 0, "put", x_mesh=200, cluster=[50], cluster_width=0.05)
+        S_check = np.array([45.0, 50.0, 55.0])
+        exact = black_scholes_value(S_check, 0, 45, 50, 50, 0.1, 0.05, "put")
+        np.testing.assert_allclose(np.interp(S_check, S, V), exact, atol=2e-4)
+
+    def test_grid_greeks(self):
+        S, V, (delta, gamma, theta) = forward_euler(0.05, 0.1, 50, 0, 100, 0, "call", return_greeks=True)
+        inner = (S > 30) & (S < 80)
+        exact = black_scholes_greeks(S[inner], 0, 45, 50, 50, 0.1, 0.05)
+        np.testing.assert_allclose(delta[inner], exact.delta, atol=1e-3)
+        np.testing.assert_allclose(gamma[inner], exact.gamma, atol=2e-3)
+        np.testing.assert_allclose(theta[inner], exact.theta, atol=0.01)
+
+    def test_to_tolerance(self):
+        S = np.array([40.0, 50.0, 60.0])
+        result = forward_euler_to_tolerance(0.05, 0.1, 50, 100, S, 1e-3, "put")
+        self.assertTrue(np.all(result.error_estimate <= 1e-3))
+        np.testing.assert_allclose(result.value, black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, "put"), atol=1e-3)
+
+    def test_unstable_timestep(self):
+        with self.assertRaises(ValueError):
+            forward_euler(0.05, 0.1, 50, 0, 100, 0, "call", dt=1e-3)
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.heat_equation import clustered_grid
+from src.options_pricing.generalities.implicit import (
+    backward_euler, batched_theta_scheme, batched_tridiagonal_factor, batched_tridiagonal_solve, crank_nicolson,
+    crank_nicolson_to_tolerance,
+)
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+from src.options_pricing.generalities.Black_Scholes_greeks import black_scholes_greeks
+
+class TestImplicit(unittest.TestCase):
+
+    def test_columns_against_closed_form(self):
+        option_types = np.array(["call", "put", "straddle"])[:, None]
+        strikes = np.array([45.0, 50.0, 55.0])
+        S, V = crank_nicolson(0.05, 0.1, 50, 0, 100, option_types, strikes=strikes, dt=0.0005)
+        self.assertEqual(V.shape, (len(S), 9))
+        V = V.reshape(len(S), 3, 3)
+        for i, option_type in enumerate(option_types[:, 0]):
+            for j, K in enumerate(strikes):
+                exact = black_scholes_value(S, 0, 45, 50, K, 0.1, 0.05, option_type)
+                np.testing.assert_allclose(V[:, i, j], exact, atol=0.01)
+
+    def test_second_order_in_time(self):
+        errors = []
+        for dt in [0.002, 0.001]:
+            S, V = crank_nicolson(0.05, 0.1, 50, 0, 100, "put", x_mesh=4000, dt=dt)
+            errors.append(np.abs(V - black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, "put")).max())
+        self.assertGreater(errors[0] / errors[1], 3)
+
+    def test_backward_euler(self):
+        S, V = backward_euler(0.05, 0.1, 50, 0, 100, dt=1e-4)
+        np.testing.assert_allclose(V, black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05), atol=0.2)
+
+    def test_recorded_revaluation_schedule(self):
+        S = np.linspace(35, 65, 31)
+        for method in ["cubic", "monotone"]:
+            solution = crank_nicolson(0.05, 0.1, 50, 0, 100, "put", dt=0.0005, record=2, method=method)
+            self.assertEqual(solution.u.shape, (len(solution.taus), 1001, 1))
+            for t in [45, 47, 49]:
+                exact = black_scholes_greeks(S, 0, t, 50, 50, 0.1, 0.05, "put")
+                delta, gamma, theta = solution.greeks(S, 50 - t)
+                np.testing.assert_allclose(solution.value(S, 50 - t), exact.value, atol=0.005)
+                np.testing.assert_allclose(delta, exact.delta, atol=0.01)
+                np.testing.assert_allclose(gamma, exact.gamma, atol=0.1)
+                np.testing.assert_allclose(theta, exact.theta, atol=0.05)
+
+    def test_recorded_slices(self):
+        solution = backward_euler(0.05, 0.1, 50, 0, 100, dt=1e-4, record=[0.01, 0.025])
+        np.testing.assert_allclose(solution.times_to_expiry, [2, 5])
+        S, V = backward_euler(0.05, 0.1, 50, 0, 100, dt=1e-4)
+        np.testing.assert_allclose(solution.V[-1], V)
+        # repeated and unsorted tau values are recorded once each
+        repeated = crank_nicolson(0.05, 0.1, 50, 0, 100, record=[0.025, 0.01, 0.01])
+        np.testing.assert_allclose(repeated.times_to_expiry, [2, 5])
+
+    def test_clustered_grid(self):
+        x = clustered_grid(-4, 1, 200, [0.0, -0.5], 0.05)
+        self.assertEqual(len(x), 201)
+        self.assertTrue(np.all(np.diff(x) > 0))
+        self.assertIn(0.0, x)
+        self.assertIn(-0.5, x)
+        # 200 nodes around the strike beat 1000 uniform ones there
+        S_check = np.array([45.0, 50.0, 55.0])
+        exact = black_scholes_value(S_check, 0, 45, 50, 50, 0.1, 0.05, "put")
+        errors = []
+        for x_mesh, cluster in [(1000, None), (200, [50])]:
+            S, V = crank_nicolson(0.05, 0.1, 50, 0, 100, "put", x_mesh=x_mesh, dt=0.0002, cluster=cluster, cluster_width=0.05)
+            errors.append(np.abs(np.interp(S_check, S, V) - exact).max())
+        self.assertLess(errors[1], errors[0])
+
+    def test_batched_tridiagonal_solve(self):
+        rng = np.random.default_rng(0)
+        lower, upper, rhs = rng.random((3, 5, 8))
+        diagonal = 3 + rng.random((5, 8))
+        x = batched_tridiagonal_solve(batched_tridiagonal_factor(lower, diagonal, upper), rhs)
+        for j in range(5):
+            matrix = np.diag(diagonal[j]) + np.diag(lower[j, 1:], -1) + np.diag(upper[j, :-1], 1)
+            np.testing.assert_allclose(matrix @ x[j], rhs[j], atol=1e-12)
+
+    def test_batched_sweep(self):
+        r = np.array([[0.02], [0.05]])
+        sigma = np.array([0.1, 0.2, 0.3])
+        for theta in [0.5, 1.0]:
+            S, V = batched_theta_scheme(r, sigma, 50, 150, 1, "put", x_mesh=300, timestep_count=50, theta=theta)
+            self.assertEqual(V.shape, (2, 3, 301))
+            for i, j in [(0, 0), (1, 2)]:
+                final_time = 0.5 * sigma[j] ** 2
+                _, single = crank_nicolson(r[i, 0], sigma[j], 50, 0, 150, "put", x_mesh=300, final_time=final_time,
+                                           dt=final_time / 50, theta=theta)
+                np.testing.assert_allclose(V[i, j], single, atol=1e-10)
+        # the explicit scheme, with well over the 323 timesteps stability needs to resolve the payoff kink
+        S, V = batched_theta_scheme(r, sigma, 50, 150, 1, "put", x_mesh=300, timestep_count=2000, theta=0)
+        exact = black_scholes_value(S, 0, 0, 1, 50, sigma[:, None], r[:, :, None], "put")
+        np.testing.assert_allclose(V, exact, atol=0.01)
+        _, plain = batched_theta_scheme(r, sigma, 50, 150, 1, "put", x_mesh=300, timestep_count=2000, theta=0, rannacher_steps=0)
+        np.testing.assert_array_equal(V, plain)
+
+    def test_american_put(self):
+        # Longstaff and Schwartz (2001), S=36, E=40, r=0.06, sigma=0.2, T=1, so final_time = 0.02
+        S, V, boundary = crank_nicolson(0.06, 0.2, 40, 0, 200, "put", x_mesh=2000, final_time=0.02, dt=0.0005, american=True)
+        self.assertAlmostEqual(float(np.interp(36, S, V)), 4.486, 3)
+        self.assertEqual(boundary.shape, (41,))
+        self.assertAlmostEqual(boundary[0], 40, 0)
+        self.assertTrue(np.all(np.diff(boundary) <= 0))
+        self.assertAlmostEqual(boundary[-1], 32.9, 1)
+        exercised = S <= boundary[-1]
+        np.testing.assert_allclose(V[exercised], 40 - S[exercised], atol=1e-9)
+        # calls are never exercised early without dividends
+        S, V, boundary = crank_nicolson(0.06, 0.2, 40, 0, 200, ["put", "call"], x_mesh=2000, final_time=0.02, american=True)
+        _, european = crank_nicolson(0.06, 0.2, 40, 0, 200, "call", x_mesh=2000, final_time=0.02)
+        np.testing.assert_allclose(V[:, 1], european)
+        self.assertTrue(np.isnan(boundary[:, 1]).all())
+        with self.assertRaises(ValueError):
+            backward_euler(0.06, 0.2, 40, 0, 200, "straddle", american=True)
+
+    def test_grid_greeks(self):
+        S, V, (delta, gamma, theta) = crank_nicolson(0.05, 0.1, 50, 0, 100, "put", dt=0.0005, return_greeks=True)
+        inner = (S > 30) & (S < 80)
+        exact = black_scholes_greeks(S[inner], 0, 45, 50, 50, 0.1, 0.05, "put")
+        np.testing.assert_allclose(delta[inner], exact.delta, atol=1e-4)
+        np.testing.assert_allclose(gamma[inner], exact.gamma, atol=1e-4)
+        np.testing.assert_allclose(theta[inner], exact.theta, atol=1e-3)
+        # the stopped region of an American put has delta -1 and no time decay
+        S, V, boundary, (delta, gamma, theta) = crank_nicolson(
+            0.06, 0.2, 40, 0, 200, "put", x_mesh=2000, final_time=0.02, dt=0.0005, american=True, return_greeks=True)
+        exercised = (S <= boundary[-1]) & (S > 1)
+        np.testing.assert_allclose(delta[exercised][:-1], -1, atol=1e-4)
+        np.testing.assert_array_equal(theta[S <= boundary[-1]], 0)
+
+    def test_crank_nicolson_to_tolerance(self):
+        S = np.array([40.0, 50.0, 60.0])
+        result = crank_nicolson_to_tolerance(0.05, 0.1, 50, 100, S, 1e-3, "put")
+        self.assertEqual(result.resolution, (800, 0.0005))
+        self.assertTrue(np.all(result.error_estimate <= 1e-3))
+        np.testing.assert_allclose(result.value, black_scholes_value(S, 0, 45, 50, 50, 0.1, 0.05, "put"), atol=1e-3)
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_call_put
+from src.options_pricing.generalities.implied_volatility import implied_volatility
+
+class TestImpliedVolatility(unittest.TestCase):
+
+    def test_round_trip(self):
+        strikes = np.linspace(100, 400, 75)
+        true_sigma = 0.4 + 0.3 * ((strikes - 236.26) / 236.26) ** 2
+        calls, puts = black_scholes_call_put(236.26, 0, 0, 36 / 360, strikes, true_sigma, 0.0439)
+        call_sigma, call_solved = implied_volatility(calls, 236.26, 0, 0, 36 / 360, strikes, 0.0439, "call")
+        put_sigma, put_solved = implied_volatility(puts, 236.26, 0, 0, 36 / 360, strikes, 0.0439, "put")
+        self.assertTrue(call_solved.all())
+        self.assertTrue(put_solved.all())
+        np.testing.assert_allclose(call_sigma, true_sigma, atol=1e-6)
+        np.testing.assert_allclose(put_sigma, true_sigma, atol=1e-6)
+
+    def test_iteration_count(self):
+        # from the rational guess, clamped by the inflection point, a smile across the
+        # strip and deep into both wings converges in a few Halley steps and one check
+        strikes = 100 * np.exp(np.linspace(-1, 1, 81))
+        for tau, max_iter in [(36 / 360, 4), (1.0, 4), (2.0, 5)]:
+            true_sigma = 0.3 + 0.3 * np.log(strikes / 100) ** 2
+            calls, puts = black_scholes_call_put(100, 0, 0, tau, strikes, true_sigma, 0.0439)
+            # prices too small to carry a volatility to double precision are left out
+            live = puts - np.maximum(strikes * np.exp(-0.0439 * tau) - 100, 0) > 1e-6
+            for price, option_type in [(calls, "call"), (puts, "put")]:
+                sigma, solved = implied_volatility(price[live], 100, 0, 0, tau, strikes[live], 0.0439, option_type, max_iter=max_iter)
+                self.assertTrue(solved.all())
+                np.testing.assert_allclose(sigma, true_sigma[live], atol=1e-8)
+
+    def test_no_solution(self):
+        # below intrinsic value, above the asset price, and at expiry
+        sigma, solved = implied_volatility([100.0, 250.0, 5.0], 236.26, 0, [0, 0, 0.1], 0.1, [100, 100, 230], 0.0439)
+        self.assertFalse(solved.any())
+        self.assertTrue(np.isnan(sigma).all())
+
+    def test_above_sigma_max(self):
+        call, put = black_scholes_call_put(100, 0, 0, 1, 100, 15.0, 0.05)
+        for price, option_type in [(call, "call"), (put, "put")]:
+            sigma, solved = implied_volatility(price, 100, 0, 0, 1, 100, 0.05, option_type)
+            self.assertFalse(solved)
+            self.assertTrue(np.isnan(sigma))
+        call = black_scholes_call_put(100, 0, 0, 1, 100, 5.0, 0.05)[0]
+        sigma, solved = implied_volatility(call, 100, 0, 0, 1, 100, 0.05, sigma_max=4.0)
+        self.assertFalse(solved)
+        sigma, solved = implied_volatility(call, 100, 0, 0, 1, 100, 0.05)
+        self.assertTrue(solved)
+        self.assertAlmostEqual(float(sigma), 5.0, 6)
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import math
+import unittest
+import numpy as np
+from src.options_pricing.generalities.monte_carlo import MonteCarloEstimator, lognormal_mean
+from src.options_pricing.generalities.brownian_motion import brownian_paths
+from src.options_pricing.generalities.exponential_expectation import get_exponential_mean_to_error
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+
+S, E, r, sigma, T = 100, 110, 0.05, 0.2, 1.0
+
+def asset(z):
+    return S * np.exp((r - 0.5 * sigma * sigma) * T + sigma * math.sqrt(T) * z[:, 0])
+
+def payoff(z):
+    return math.exp(-r * T) * np.maximum(asset(z) - E, 0)
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def test_variance_reduction(self):
+        exact = black_scholes_value(S, 0, 0, T, E, sigma, r)
+        samples = {}
+        for name, options in [("plain", {}), ("control", {"control": asset, "control_mean": S * math.exp(r * T)}),
+                              ("stratified", {"strata": 100, "antithetic": True})]:
+            estimate = MonteCarloEstimator(payoff, rng=np.random.default_rng(0), **options).run_to_error(0.02)
+            self.assertLessEqual(estimate.standard_error, 0.02)
+            self.assertAlmostEqual(estimate.value, exact, delta=4 * 0.02)
+            samples[name] = estimate.samples
+        self.assertLess(samples["control"], samples["plain"] / 2)
+        self.assertLess(samples["stratified"], samples["plain"] / 10)
+
+    def test_antithetic_linear_integrand(self):
+        estimate = MonteCarloEstimator(lambda z: 3 + z.sum(axis=1), dimension=4, antithetic=True).estimate(1000)
+        self.assertAlmostEqual(estimate.value, 3)
+        self.assertAlmostEqual(estimate.standard_error, 0)
+
+    def test_importance_sampling(self):
+        # P(Z > 4) is about 3e-5, shifting the draws to the threshold makes the event common
+        estimator = MonteCarloEstimator(lambda z: (z[:, 0] > 4).astype(float), shift=4, rng=np.random.default_rng(1))
+        estimate = estimator.estimate(100000)
+        self.assertAlmostEqual(estimate.value, 3.167e-5, delta=3 * estimate.standard_error)
+        # plain sampling would have a standard error near sqrt(3e-5 / 1e5) = 1.8e-5
+        self.assertLess(estimate.standard_error, 5e-7)
+
+    def test_exponential_mean(self):
+        estimate = get_exponential_mean_to_error(0.01, 2, 1, rng=np.random.default_rng(4))
+        self.assertAlmostEqual(estimate.value, lognormal_mean(2, 1), delta=0.05)
+        self.assertLessEqual(estimate.samples, 100000)
+
+    def test_brownian_paths_integrand(self):
+        # E[max(X(1), 0)] = 1/sqrt(2 pi) for standard Brownian motion
+        estimator = MonteCarloEstimator(
+            lambda z: np.maximum(brownian_paths(len(z), 20, 0.05, normals=z)[:, -1], 0), dimension=20,
+            antithetic=True, rng=np.random.default_rng(2))
+        estimate = estimator.run_to_error(0.002)
+        self.assertAlmostEqual(estimate.value, 1 / math.sqrt(2 * math.pi), delta=0.008)
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from importlib import resources
+from src.options_pricing.generalities.options_chain import OptionsChain
+
+class TestOptionsChain(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "tsla_call_20250320_20250425")
+        source = resources.files("src.options_pricing.options_chains") / "tsla_call_20250320_20250425"
+        shutil.copyfile(source, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse(self):
+        chain = OptionsChain.parse(self.path)
+        self.assertTrue(np.all(np.diff(chain.strike) >= 0))
+        row = np.flatnonzero(chain.strike == 140)[0]
+        self.assertEqual(chain.contract[row], "TSLA250425C00140000")
+        self.assertEqual(chain.timestamp[row], np.datetime64("2025-03-19T14:29"))
+        self.assertEqual(chain.volume[row], 2966)
+        self.assertAlmostEqual(chain.implied_volatility[row], 1.1211)
+        row = np.flatnonzero(chain.strike == 130)[0]
+        self.assertTrue(np.isnan(chain.volume[row]))
+
+    def test_cache(self):
+        chain = OptionsChain.load(self.path)
+        self.assertTrue(os.path.exists(self.path + OptionsChain.cache_suffix))
+        cached = OptionsChain.load(self.path)
+        for name in OptionsChain.columns:
+            np.testing.assert_array_equal(getattr(cached, name), getattr(chain, name))
+
+        # a changed source file invalidates the cache
+        with open(self.path, "a") as f:
+            f.write("\nTSLA250425C00999000\t3/20/2025 3:59 PM\t999\t0.01\t0.00\t0.02\t0.00\t0.00%\t-\t1\t300.00%\n")
+        self.assertEqual(len(OptionsChain.load(self.path)), len(chain) + 1)
+
+    def test_cache_file_mode(self):
+        OptionsChain.load(self.path)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(os.stat(self.path + OptionsChain.cache_suffix).st_mode & 0o777, 0o666 & ~umask)
+
+    def test_corrupt_cache(self):
+        chain = OptionsChain.load(self.path)
+        cache_path = self.path + OptionsChain.cache_suffix
+        with open(cache_path, "rb") as f:
+            contents = f.read()
+        for corrupt in (contents[:len(contents) // 2], b"not a zip file"):
+            with open(cache_path, "wb") as f:
+                f.write(corrupt)
+            reloaded = OptionsChain.load(self.path)
+            np.testing.assert_array_equal(reloaded.strike, chain.strike)
+            # the cache is rewritten and valid again, without stray temporary files
+            cached = OptionsChain._read_cache(cache_path, os.stat(self.path))
+            np.testing.assert_array_equal(cached.contract, chain.contract)
+            self.assertEqual(sorted(os.listdir(self.temp_dir)), sorted([os.path.basename(self.path), os.path.basename(cache_path)]))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from src.options_pricing.generalities.pde_cache import PDESolutionCache
+from src.options_pricing.generalities.Black_Scholes_closed_form_02 import black_scholes_value
+
+class TestPDESolutionCache(unittest.TestCase):
+
+    def test_chain_from_one_solve(self):
+        cache = PDESolutionCache(dt=0.0005)
+        strikes = np.linspace(35, 65, 75)
+        for option_type in ["call", "put"]:
+            for t in [45, 47, 49]:
+                values = cache.value(50, strikes, t, 50, 0.05, 0.1, option_type)
+                exact = black_scholes_value(50, 0, t, 50, strikes, 0.1, 0.05, option_type)
+                np.testing.assert_allclose(values, exact, atol=0.02)
+        # t = 47 and 49 fall inside the tau grid solved for t = 45
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.hits, 4)
+
+    def test_least_recently_used_eviction(self):
+        cache = PDESolutionCache(maxsize=2, x_mesh=200)
+        for sigma in [0.1, 0.2, 0.3]:
+            cache.value(50, 50, 0, 1, 0.05, sigma)
+        self.assertEqual(len(cache), 2)
+        cache.value(50, 50, 0, 1, 0.05, 0.3)
+        self.assertEqual(cache.hits, 1)
+        cache.value(50, 50, 0, 1, 0.05, 0.1)
+        self.assertEqual(cache.misses, 4)
+
+    def test_outside_grid(self):
+        with self.assertRaises(ValueError):
+            PDESolutionCache().value(1000, 10, 0, 1, 0.05, 0.2)
+
+
+if __name__=='__main__':
+    unittest.main()
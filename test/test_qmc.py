@@ -0,0 +1,63 @@
+import math
+import unittest
+import numpy as np
+from src.options_pricing.generalities.qmc import bridge_schedule, brownian_bridge_normals, rqmc_estimate, sobol_normals
+from src.options_pricing.generalities.monte_carlo import MonteCarloEstimator
+from src.options_pricing.generalities.brownian_motion import brownian_paths
+from src.options_pricing.interest_rate_products import ho_lee
+from src.options_pricing.interest_rate_products.heath_jarrow_morton import HeathJarrowMorton
+
+def average_call(z):
+    # call struck at 0 on the average of a standard Brownian path over 64 steps
+    return np.maximum(np.cumsum(z, axis=1).mean(axis=1) / math.sqrt(z.shape[1]), 0)
+
+class TestQMC(unittest.TestCase):
+
+    def test_bridge_schedule(self):
+        for n_steps in [1, 7, 64, 100]:
+            self.assertEqual(sorted(entry[0] for entry in bridge_schedule(n_steps)), list(range(1, n_steps + 1)))
+
+    def test_bridge_normals_are_independent(self):
+        increments = brownian_bridge_normals(np.random.default_rng(0).standard_normal((100000, 7)))
+        np.testing.assert_allclose(np.cov(increments.T), np.eye(7), atol=0.02)
+
+    def test_sobol_normals(self):
+        z = sobol_normals(4096, 3, np.random.default_rng(1))
+        self.assertTrue(np.isfinite(z).all())
+        np.testing.assert_allclose(z.mean(axis=0), 0, atol=1e-3)
+        np.testing.assert_allclose(z.std(axis=0), 1, atol=1e-2)
+
+    def test_rqmc_beats_pseudo_random(self):
+        # the average of a path with variance 1/3 + 1/(2n) + 1/(6n^2), so E[max(A, 0)] = sqrt(var / 2 pi)
+        variance = 1 / 3 + 1 / 128 + 1 / (6 * 64 * 64)
+        exact = math.sqrt(variance / (2 * math.pi))
+        sobol = rqmc_estimate(average_call, 1024, 64, bridge=True, rng=np.random.default_rng(2))
+        pseudo = MonteCarloEstimator(average_call, dimension=64, rng=np.random.default_rng(2)).estimate(16 * 1024)
+        self.assertAlmostEqual(sobol.value, exact, delta=4 * sobol.standard_error)
+        self.assertLess(sobol.standard_error, pseudo.standard_error / 5)
+
+    def test_sobol_brownian_paths(self):
+        paths = brownian_paths(4096, 16, 1 / 16, mu=0.5, rng=np.random.default_rng(3), sampling="sobol")
+        self.assertAlmostEqual(paths[:, -1].mean(), 0.5, delta=1e-3)
+        self.assertAlmostEqual(paths[:, -1].var(), 1.0, delta=0.01)
+        with self.assertRaises(ValueError):
+            brownian_paths(10, 4, 0.25, sampling="halton")
+
+    def test_hjm_discount_curve(self):
+        # spread of the reconstructed discount curve over repeated runs
+        hjm = HeathJarrowMorton(seed=5)
+        P = lambda t: math.exp(-0.04 * t)
+        f0 = lambda t: -(math.log(P(t + hjm.dt)) - math.log(P(t))) / hjm.dt
+        frf = lambda T: (f0(T + hjm.dt) - f0(T - hjm.dt)) / (2 * hjm.dt) + hjm.sigma * hjm.sigma * T
+        hl = ho_lee.HoLee.create(lambda x: frf, hjm.sigma)
+        time_values = [hjm.dt * i for i in range(101)]
+        spreads = {}
+        for sampling, number_of_runs in [("pseudo", 1000), ("sobol", 64)]:
+            curves = [hjm.average_simulations(number_of_runs, time_values, *hjm.run_simulations(number_of_runs, hl, f0, sampling))[1]
+                      for _ in range(4)]
+            spreads[sampling] = np.std(curves, axis=0).max()
+        self.assertLess(spreads["sobol"], spreads["pseudo"])
+
+
+if __name__=='__main__':
+    unittest.main()
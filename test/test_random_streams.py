@@ -0,0 +1,59 @@
+import math
+import unittest
+import numpy as np
+from src.options_pricing.generalities.random_streams import RandomStream, as_generator, resolve_rng, spawn_streams
+from src.options_pricing.generalities.brownian_motion import brownian_paths
+from src.options_pricing.generalities.brownian_motion_first_hitting_time import first_hitting_times
+from src.options_pricing.generalities.monte_carlo import MonteCarloEstimator
+from src.options_pricing.interest_rate_products import ho_lee
+from src.options_pricing.interest_rate_products.heath_jarrow_morton import HeathJarrowMorton
+
+class TestRandomStreams(unittest.TestCase):
+
+    def test_buffered_normals(self):
+        stream = RandomStream(1, block_size=1000)
+        self.assertIsInstance(stream.standard_normal(), float)
+        # draws straddling a refill, and one larger than a block
+        draws = np.concatenate([stream.standard_normal(700), stream.standard_normal((30, 20)).ravel(),
+                                stream.standard_normal(5000)])
+        self.assertEqual(len(draws), 6300)
+        self.assertAlmostEqual(draws.mean(), 0, delta=0.05)
+        self.assertAlmostEqual(draws.std(), 1, delta=0.05)
+        self.assertAlmostEqual(float(np.mean(stream.normal(2.0, 3.0, 10000))), 2, delta=0.1)
+
+    def test_seed_reproduces(self):
+        np.testing.assert_array_equal(RandomStream(7).standard_normal(10), RandomStream(7).standard_normal(10))
+        np.testing.assert_array_equal(brownian_paths(5, 10, 0.1, rng=11), brownian_paths(5, 10, 0.1, rng=11))
+        np.testing.assert_array_equal(first_hitting_times(0, 1, 0, 0.1, 100, 50, rng=RandomStream(3)).times,
+                                      first_hitting_times(0, 1, 0, 0.1, 100, 50, rng=RandomStream(3)).times)
+        self.assertEqual(MonteCarloEstimator(lambda z: z[:, 0], rng=5).estimate(100),
+                         MonteCarloEstimator(lambda z: z[:, 0], rng=5).estimate(100))
+
+    def test_spawned_streams_are_independent(self):
+        streams = spawn_streams(RandomStream(2), 4)
+        draws = np.array([stream.standard_normal(20000) for stream in streams])
+        np.testing.assert_allclose(np.corrcoef(draws), np.eye(4), atol=0.03)
+        # the same children come back from the same seed
+        np.testing.assert_array_equal(spawn_streams(RandomStream(2), 4)[3].standard_normal(5), draws[3, :5])
+        self.assertEqual(len(spawn_streams(np.random.default_rng(0), 3)), 3)
+
+    def test_resolve_rng(self):
+        generator = np.random.default_rng(0)
+        self.assertIs(resolve_rng(generator), generator)
+        self.assertIsInstance(resolve_rng(None), np.random.Generator)
+        self.assertIsInstance(resolve_rng(4), RandomStream)
+        self.assertIsInstance(as_generator(RandomStream(4)), np.random.Generator)
+
+    def test_seeded_hjm(self):
+        P = lambda t: math.exp(-0.04 * t)
+        f0 = lambda t: -(math.log(P(t + 0.1)) - math.log(P(t))) / 0.1
+        hl = ho_lee.HoLee.create(lambda x: lambda r: 0.0, 0.01)
+        first = HeathJarrowMorton(seed=21).run_simulations(20, hl, f0)
+        second = HeathJarrowMorton(seed=21).run_simulations(20, hl, f0)
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+        self.assertFalse(np.array_equal(first[0], HeathJarrowMorton(seed=22).run_simulations(20, hl, f0)[0]))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import math
+import unittest
+import numpy as np
+from src.options_pricing.interest_rate_products import ho_lee, hull_white
+from src.options_pricing.interest_rate_products.hull_white import ornstein_uhlenbeck_moments
+from src.options_pricing.interest_rate_products.heath_jarrow_morton import HeathJarrowMorton
+
+class TestShortRate(unittest.TestCase):
+
+    def setUp(self):
+        self.hjm = HeathJarrowMorton(seed=1)
+        dt, sigma = self.hjm.dt, self.hjm.sigma
+        self.P = lambda t: math.exp(-0.04 * t)
+        self.f0 = lambda t: -(math.log(self.P(t + dt)) - math.log(self.P(t))) / dt
+        self.frf = lambda T: (self.f0(T + dt) - self.f0(T - dt)) / (2 * dt) + sigma * sigma * T
+
+    def test_ho_lee_reconstructs_discount_curve(self):
+        hl = ho_lee.HoLee.create(lambda x: self.frf, self.hjm.sigma)
+        run_results, M_matrix = self.hjm.run_simulations(50000, hl, self.f0)
+        self.assertEqual(run_results.shape, (50000, 101))
+        time_values = [self.hjm.dt * i for i in range(1, 101)]
+        averaged_results, P_graph = self.hjm.average_simulations(50000, time_values, run_results, M_matrix)
+        exact = np.exp(-0.04 * self.hjm.dt * np.arange(100))
+        np.testing.assert_allclose(P_graph, exact, atol=2e-3)
+
+    def test_theta_list_matches_function(self):
+        theta_vec = [self.frf(i * 0.1) for i in range(100)]
+        normals = np.random.default_rng(0).standard_normal((3, 100))
+        from_function = ho_lee.HoLee.create(lambda x: self.frf, 0.01).simulate_paths(10, 0.1, 0.04, 3, normals=normals)
+        from_list = ho_lee.HoLee.create(theta_vec, 0.01).simulate_paths(10, 0.1, 0.04, 3, normals=normals)
+        np.testing.assert_allclose(from_list, from_function)
+        np.testing.assert_allclose(ho_lee.HoLee.create(theta_vec, 0.01).eval_theta_list(0.04, 0.1, theta_vec, normals[1]),
+                                   from_list[1])
+        with self.assertRaises(ValueError):
+            ho_lee.HoLee.create(theta_vec[:50], 0.01).simulate_paths(10, 0.1, 0.04, 3)
+
+    def test_hull_white_matches_euler_steps(self):
+        hw = hull_white.HullWhiteFunction(lambda x: lambda t: 0.05 - 0.01 * t, 0.5, 0.01)
+        normals = np.random.default_rng(1).standard_normal((2, 30))
+        paths = hw.simulate_paths(3, 0.1, 0.02, 2, normals=normals)
+        for run in range(2):
+            r = [0.02]
+            for i, z in enumerate(normals[run]):
+                r.append(hw.eval_float_arg(r[-1], None, 0.1, z, i * 0.1))
+            np.testing.assert_allclose(paths[run], r)
+
+    def test_ho_lee_matches_single_steps(self):
+        theta = lambda t: 0.01 + 0.002 * t
+        normals = np.random.default_rng(2).standard_normal((2, 30))
+        for hl in (ho_lee.HoLee.create(lambda x: theta, 0.01), ho_lee.HoLee.create([theta(i * 0.1) for i in range(30)], 0.01)):
+            paths = hl.simulate_paths(3, 0.1, 0.02, 2, normals=normals)
+            for run in range(2):
+                r = [0.02]
+                for i, z in enumerate(normals[run]):
+                    r.append(hl.eval_float_arg(r[-1], None, 0.1, z, i * 0.1))
+                np.testing.assert_allclose(paths[run], r)
+
+    def test_exact_vasicek_discount_factors(self):
+        a, b, sigma, r0 = 0.5, 0.05, 0.02, 0.02
+        vasicek = hull_white.HullWhiteFunction(lambda x: lambda t: b, a, sigma)
+
+        def bond(T):
+            B = (1 - math.exp(-a * T)) / a
+            return math.exp((b - sigma * sigma / (2 * a * a)) * (B - T) - sigma * sigma * B * B / (4 * a) - B * r0)
+
+        times = [1, 2, 5, 10]
+        discount_factors = vasicek.discount_factors(times, r0, 200000, rng=1)
+        self.assertEqual(discount_factors.shape, (200000, 4))
+        error = np.abs(discount_factors.mean(axis=0) - [bond(T) for T in times])
+        standard_error = discount_factors.std(axis=0) / math.sqrt(200000)
+        self.assertTrue(np.all(error < 4 * standard_error))
+        # Euler steps of 0.5 miss the ten year bond by many standard errors
+        rates = vasicek.simulate_paths(10, 0.5, r0, 200000, rng=2)
+        euler = np.mean(1 / self.hjm.money_market_account(rates, 0.5)[:, -1])
+        self.assertGreater(abs(euler - bond(10)), 10 * standard_error[-1])
+
+    def test_exact_steps_compose(self):
+        # one step to 10 and 100 steps to 10 sample the same joint distribution of (r, I)
+        hw = hull_white.HullWhiteFunction(lambda x: lambda t: 0.03 + 0.002 * t, 0.3, 0.01)
+        one = np.stack(hw.exact_paths([10], 0.02, 100000, rng=3))[:, :, -1]
+        many = np.stack(hw.exact_paths(np.linspace(0.1, 10, 100), 0.02, 100000, rng=4))[:, :, -1]
+        np.testing.assert_allclose(one.mean(axis=1), many.mean(axis=1), rtol=5e-3)
+        np.testing.assert_allclose(np.cov(one), np.cov(many), rtol=0.03)
+        with self.assertRaises(ValueError):
+            hw.exact_paths([1, 1], 0.02, 10)
+
+    def test_ornstein_uhlenbeck_small_lambda(self):
+        np.testing.assert_allclose(ornstein_uhlenbeck_moments(1e-7, 0.1, 2.0), ornstein_uhlenbeck_moments(0, 0.1, 2.0),
+                                   rtol=1e-6)
+
+    def test_money_market_account(self):
+        rates = np.array([[0.01, 0.03, 0.05]])
+        np.testing.assert_allclose(self.hjm.money_market_account(rates, 0.5), [[1, math.exp(0.01), math.exp(0.03)]])
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from datetime import date
+from importlib import resources
+from src.options_pricing.generalities.volatility_surface import VolatilitySurface, solve_chain
+
+class TestVolatilitySurface(unittest.TestCase):
+
+    def test_total_variance_interpolation(self):
+        strikes = np.array([90.0, 100.0, 110.0])
+        solved = np.ones(3, dtype=bool)
+        smiles = [
+            (1.0, strikes, np.array([0.3, 0.2, 0.3]), solved),
+            (0.5, strikes, np.array([0.4, 0.3, 0.4]), solved),
+        ]
+        surface = VolatilitySurface.from_smiles("test", date(2025, 1, 1), 100.0, smiles)
+        np.testing.assert_allclose(surface.expiries, [0.5, 1.0])
+        # on the grid the volatilities are reproduced
+        np.testing.assert_allclose(surface.implied_volatility(strikes, 0.5), [0.4, 0.3, 0.4])
+        # between expiries total variance is linear in T
+        w = 0.5 * (0.3 ** 2 * 0.5 + 0.2 ** 2 * 1.0)
+        self.assertAlmostEqual(float(surface.implied_volatility(100, 0.75)), np.sqrt(w / 0.75))
+        # outside the grid the nearest strike and a flat volatility in T are used
+        self.assertAlmostEqual(float(surface.implied_volatility(200, 2.0)), 0.3)
+
+    def test_from_chains(self):
+        # copies of the shipped chains, so the cache files land in a temporary directory
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        chain_specs = []
+        for ticker, cur_date, exercise_date, current_price, data_file, one_month_rate in [
+            ("aapl", date(2025, 3, 19), date(2025, 4, 17), 215.24, "aapl_call_20250319_20250417", 0.0437),
+            ("tsla", date(2025, 3, 20), date(2025, 4, 25), 236.26, "tsla_call_20250320_20250425", 0.0439),
+        ]:
+            path = os.path.join(temp_dir, data_file)
+            shutil.copyfile(resources.files("src.options_pricing.options_chains") / data_file, path)
+            chain_specs.append({"ticker": ticker, "cur_date": cur_date, "exercise_date": exercise_date,
+                                "current_price": current_price, "data_file": path, "one_month_rate": one_month_rate})
+
+        surfaces = VolatilitySurface.from_chains(chain_specs, max_workers=2)
+        self.assertEqual(list(surfaces), ["aapl", "tsla"])
+        for spec in chain_specs:
+            expected = VolatilitySurface.from_smiles(spec["ticker"], spec["cur_date"], spec["current_price"], [solve_chain(spec)])
+            surface = surfaces[spec["ticker"]]
+            self.assertEqual(surface.current_price, spec["current_price"])
+            np.testing.assert_array_equal(surface.expiries, expected.expiries)
+            np.testing.assert_array_equal(surface.strikes, expected.strikes)
+            np.testing.assert_array_equal(surface.total_variance, expected.total_variance)
+            self.assertTrue(np.all(np.isfinite(surface.total_variance)))
+
+
+if __name__=='__main__':
+    unittest.main()